@@ -1,17 +1,56 @@
-from flask import Flask
+import logging
+import os
+from flask import Flask, request
 from config import config
 from datetime import datetime
 
+def configure_logging(level):
+    """Send log records of the app package to stderr, at the given level and above"""
+    logger = logging.getLogger('app')
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+# How long browsers keep versioned static files (see create_app)
+STATIC_MAX_AGE = 365 * 24 * 3600
+
 def create_app(config_name='default'):
     """Application factory function to create and configure the Flask app"""
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
+    configure_logging(app.config['LOG_LEVEL'])
     
     # Register blueprints
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
     
+    # Delete old screenshots in the background (once per process)
+    from app import data_manager as dm
+    dm.start_screenshot_sweeper()
+    
+    # Static URLs carry the file's modification time, so a changed file gets
+    # a new URL and browsers may keep each version for a year
+    @app.url_defaults
+    def version_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            try:
+                values['v'] = int(os.stat(os.path.join(app.static_folder, values['filename'])).st_mtime)
+            except OSError:
+                pass
+    
+    @app.after_request
+    def cache_versioned_static(response):
+        if request.endpoint == 'static' and 'v' in request.args and response.status_code in (200, 206, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+    
     # Add context processor for common template variables
     @app.context_processor
     def inject_now():
@@ -1,7 +1,6 @@
 # comments.py
 import time
 import random
-import os
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
@@ -11,15 +10,8 @@ from app import data_manager as dm
 # Helper function to save screenshots
 def save_screenshot(driver, prefix, group_id):
     """Helper function to save screenshots to a consistent location"""
-    timestamp = int(time.time())
-    screenshots_dir = os.path.join(os.getcwd(), 'screenshots')
-    os.makedirs(screenshots_dir, exist_ok=True)
-    filename = f"{prefix}_{timestamp}.png"
-    filepath = os.path.join(screenshots_dir, filename)
-    driver.save_screenshot(filepath)
-    # Log the screenshot
-    dm.add_log(f"Screenshot saved: {filename}", "info", group_id=group_id)
-    return filename
+    # Encoded, written, recorded and logged by a background worker
+    return dm.save_screenshot(driver.get_screenshot_as_png(), prefix, group_id=group_id)
 
 def post_comment_on_task(driver, task_url, comment_text, image_path=None, group_id=None):
     """
@@ -1,6 +1,5 @@
 import time
 import random
-import os
 import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -61,15 +60,8 @@ class Capsolver(Extension):
 # Helper function for screenshots
 # ------------------------------
 def save_screenshot(driver, prefix, group_id):
-    timestamp = int(time.time())
-    screenshots_dir = os.path.join(os.getcwd(), 'screenshots')
-    os.makedirs(screenshots_dir, exist_ok=True)
-    filename = f"{prefix}_{timestamp}.png"
-    filepath = os.path.join(screenshots_dir, filename)
-    driver.save_screenshot(filepath)
-    # Log the screenshot
-    dm.add_log(f"Screenshot saved: {filename}", "info", group_id=group_id)
-    return filename
+    # Encoded, written, recorded and logged by a background worker
+    return dm.save_screenshot(driver.get_screenshot_as_png(), prefix, group_id=group_id)
 
 
 # ------------------------------
@@ -1,10 +1,124 @@
-import json
 import os
 import uuid
-from datetime import datetime
-from config import ACCOUNTS_FILE, CITIES_FILE, MESSAGES_FILE, SCHEDULES_FILE, LOGS_FILE, SETTINGS_FILE
+import base64
+import logging
+import threading
+from datetime import datetime, timedelta
+from config import (ACCOUNTS_FILE, CITIES_FILE, MESSAGES_FILE, SCHEDULES_FILE, LOGS_FILE, LOG_STORE_FILE,
+                    LOG_DIR, SETTINGS_FILE, STORAGE_BACKEND, SQLITE_DB_FILE, LOG_WRITER_MODE, LOG_QUEUE_SIZE,
+                    LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_RETENTION_DAYS, LOG_RETENTION_BYTES,
+                    SCREENSHOTS_DIR, SCREENSHOT_THUMBNAILS_DIR, SCREENSHOT_RETENTION_DAYS,
+                    SCREENSHOT_FAILED_RETENTION_DAYS, SCREENSHOT_RETENTION_COUNT, SCREENSHOT_RETENTION_BYTES,
+                    SCREENSHOT_SWEEP_INTERVAL, SCREENSHOT_FORMAT, SCREENSHOT_QUALITY, init_data_files)
+from app.json_store import JsonStore
+from app.log_store import JsonlLogStore
+from app.screenshot_manifest import ScreenshotManifest
+from app.screenshot_retention import ScreenshotSweeper, select_expired, stored_bytes
+from app.thumbnails import ThumbnailCache
 import math
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "run_interval": 30,
+    "max_posts_per_day": 10,
+    "timeout_between_actions": 5,
+    "enable_random_delays": True
+}
+
+_store = None
+_log_sink = None
+_screenshots = None
+_thumbnails = ThumbnailCache(SCREENSHOTS_DIR, SCREENSHOT_THUMBNAILS_DIR)
+_screenshot_sweeper = None
+_screenshot_sink = None
+_store_lock = threading.Lock()
+# Notified whenever add_log writes an entry in this process
+_log_written = threading.Condition()
+
+def _json_store():
+    return JsonStore(
+        collection_files={
+            'accounts': ACCOUNTS_FILE,
+            'cities': CITIES_FILE,
+            'messages': MESSAGES_FILE,
+            'schedules': SCHEDULES_FILE,
+        },
+        settings_file=SETTINGS_FILE,
+        log_store=JsonlLogStore(
+            LOG_DIR,
+            retention_days=LOG_RETENTION_DAYS,
+            retention_bytes=LOG_RETENTION_BYTES,
+            legacy_files=[LOG_STORE_FILE, LOGS_FILE]
+        )
+    )
+
+def _get_store():
+    """Return the storage backend selected by STORAGE_BACKEND, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                # Scripts use the store without create_app, so set up the data directory here too
+                init_data_files()
+                if STORAGE_BACKEND == 'json':
+                    _store = _json_store()
+                elif STORAGE_BACKEND == 'sqlite':
+                    from app.sqlite_store import SqliteStore
+                    # A new database starts with whatever the JSON files hold
+                    _store = SqliteStore(
+                        SQLITE_DB_FILE,
+                        retention_days=LOG_RETENTION_DAYS,
+                        retention_bytes=LOG_RETENTION_BYTES,
+                        import_from=_json_store()
+                    )
+                else:
+                    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}")
+    return _store
+
+def _get_log_sink():
+    """Return the object add_log and get_logs go through: the store itself, or a batched writer in front of it"""
+    global _log_sink
+    if _log_sink is None:
+        store = _get_store()
+        with _store_lock:
+            if _log_sink is None:
+                if LOG_WRITER_MODE == 'sync':
+                    _log_sink = store
+                elif LOG_WRITER_MODE == 'batched':
+                    from app.log_writer import BatchedLogWriter
+                    _log_sink = BatchedLogWriter(
+                        store,
+                        max_queue=LOG_QUEUE_SIZE,
+                        batch_size=LOG_BATCH_SIZE,
+                        flush_interval=LOG_FLUSH_INTERVAL
+                    )
+                else:
+                    raise ValueError(f"Unknown LOG_WRITER_MODE: {LOG_WRITER_MODE!r}")
+    return _log_sink
+
+def _get_screenshots():
+    """Return the screenshot manifest, creating it on first use"""
+    global _screenshots
+    if _screenshots is None:
+        with _store_lock:
+            if _screenshots is None:
+                _screenshots = ScreenshotManifest(SCREENSHOTS_DIR)
+    return _screenshots
+
+def flush_logs():
+    """Write any queued log entries to the store (no-op in sync mode)"""
+    sink = _get_log_sink()
+    if hasattr(sink, 'flush'):
+        sink.flush()
+
+def get_log_writer_metrics():
+    """Return queue depth and flush latency of the log writer"""
+    sink = _get_log_sink()
+    if hasattr(sink, 'metrics'):
+        return dict(sink.metrics(), mode='batched')
+    return {'mode': 'sync', 'queue_depth': 0}
+
 def generate_id():
     """Generate a unique ID for new records"""
     return str(uuid.uuid4())
@@ -16,15 +130,11 @@ def datetime_converter(obj):
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
 def get_accounts():
-    """Get all accounts from JSON file"""
-    if os.path.exists(ACCOUNTS_FILE):
-        with open(ACCOUNTS_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    """Get all accounts"""
+    return _get_store().list('accounts')
 
 def add_account(email, password, active=True):
-    """Add a new account to JSON file"""
-    accounts = get_accounts()
+    """Add a new account"""
     new_account = {
         'id': generate_id(),
         'email': email,
@@ -33,42 +143,30 @@ def add_account(email, password, active=True):
         'last_used': None,
         'created_at': datetime.utcnow().isoformat()
     }
-    accounts.append(new_account)
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accounts, f, indent=4)
+    _get_store().insert('accounts', new_account)
     return new_account
 
 def get_cities():
-    """Get all cities from JSON file"""
-    if os.path.exists(CITIES_FILE):
-        with open(CITIES_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    """Get all cities"""
+    return _get_store().list('cities')
 
 def add_city(name, radius):
-    """Add a new city to JSON file"""
-    cities = get_cities()
+    """Add a new city"""
     new_city = {
         'id': generate_id(),
         'name': name,
         'radius': int(radius),
         'created_at': datetime.utcnow().isoformat()
     }
-    cities.append(new_city)
-    with open(CITIES_FILE, 'w') as f:
-        json.dump(cities, f, indent=4)
+    _get_store().insert('cities', new_city)
     return new_city
 
 def get_messages():
-    """Get all messages from JSON file"""
-    if os.path.exists(MESSAGES_FILE):
-        with open(MESSAGES_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    """Get all messages"""
+    return _get_store().list('messages')
 
 def add_message(content, image=None):
-    """Add a new message to JSON file"""
-    messages = get_messages()
+    """Add a new message"""
     new_message = {
         'id': generate_id(),
         'content': content,
@@ -76,21 +174,15 @@ def add_message(content, image=None):
         'created_at': datetime.utcnow().isoformat(),
         'last_used': None
     }
-    messages.append(new_message)
-    with open(MESSAGES_FILE, 'w') as f:
-        json.dump(messages, f, indent=4)
+    _get_store().insert('messages', new_message)
     return new_message
 
 def get_schedules():
-    """Get all schedules from JSON file"""
-    if os.path.exists(SCHEDULES_FILE):
-        with open(SCHEDULES_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    """Get all schedules"""
+    return _get_store().list('schedules')
 
 def add_schedule(start_time, end_time, active=True):
-    """Add a new schedule to JSON file"""
-    schedules = get_schedules()
+    """Add a new schedule"""
     new_schedule = {
         'id': generate_id(),
         'start_time': start_time,
@@ -98,19 +190,64 @@ def add_schedule(start_time, end_time, active=True):
         'active': active,
         'created_at': datetime.utcnow().isoformat()
     }
-    schedules.append(new_schedule)
-    with open(SCHEDULES_FILE, 'w') as f:
-        json.dump(schedules, f, indent=4)
+    _get_store().insert('schedules', new_schedule)
     return new_schedule
 
-def get_logs(page=1, per_page=10, group_id=None):
+def _encode_cursor(entry):
+    """Return the opaque page cursor of a log entry: its (timestamp, id) sort key"""
+    key = f"{entry.get('timestamp', '')}|{entry.get('id', '')}"
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """Return the (timestamp, id) of a cursor made by _encode_cursor; raises ValueError for anything else"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        key = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+    except ValueError as e:
+        raise ValueError(f"Invalid log cursor: {cursor!r}") from e
+    timestamp, sep, log_id = key.partition('|')
+    if not sep:
+        raise ValueError(f"Invalid log cursor: {cursor!r}")
+    return timestamp, log_id
+
+def _get_logs_by_cursor(store, per_page, group_id, before, after):
+    """Fetch the page of logs next to a cursor; see get_logs"""
+    before = _decode_cursor(before) if before else None
+    after = _decode_cursor(after) if after else None
+    # One extra entry tells whether there is another page in the same direction
+    items = store.query_logs(group_id=group_id, limit=per_page + 1, before=before, after=after)
+    if after is not None:
+        has_newer = len(items) > per_page
+        if not has_newer:
+            # Paged back to the newest entries: show a full first page
+            return _get_logs_by_cursor(store, per_page, group_id, None, None)
+        items = items[1:]
+        has_older = True
+    else:
+        has_older = len(items) > per_page
+        items = items[:per_page]
+        has_newer = before is not None
+    return {
+        'items': items,
+        'per_page': per_page,
+        'newer': _encode_cursor(items[0]) if has_newer and items else None,
+        'older': _encode_cursor(items[-1]) if has_older and items else None
+    }
+
+def get_logs(page=1, per_page=10, group_id=None, before=None, after=None):
     """
-    Get logs from the log file with pagination
+    Get logs from the log store with pagination
+    
+    Pages are either numbered (page) or relative to a cursor (before/after).
+    Cursor pages cost the same however deep they are; every result carries
+    'newer' and 'older' cursors (None at either end) for the adjacent pages.
     
     Args:
-        page (int): Page number (1-indexed)
+        page (int): Page number (1-indexed), used when no cursor is given
         per_page (int): Number of logs per page
         group_id (str, optional): Filter logs by group_id
+        before (str, optional): Cursor; return the page of logs older than it
+        after (str, optional): Cursor; return the page of logs newer than it
         
     Returns:
         dict: Dictionary with logs and pagination information
@@ -120,65 +257,224 @@ def get_logs(page=1, per_page=10, group_id=None):
         page = max(1, int(page))
         per_page = max(1, int(per_page))
         
-        if os.path.exists(LOGS_FILE):
-            try:
-                with open(LOGS_FILE, 'r') as f:
-                    logs = json.load(f)
-                print(f"Successfully loaded {len(logs)} logs from {LOGS_FILE}")
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error when loading logs: {e}")
-                logs = []
-        else:
-            print(f"Logs file not found at {LOGS_FILE}")
-            logs = []
+        if not all(is_log_cursor(cursor) for cursor in (before, after) if cursor):
+            logger.warning("Ignoring invalid log cursor (before=%r, after=%r)", before, after)
+            before = after = None
         
-        # Make sure logs is a list
-        if not isinstance(logs, list):
-            print(f"Logs is not a list, it's a {type(logs)}")
-            logs = []
-            
-        # Filter by group_id if provided
+        store = _get_log_sink()
+        total_logs = store.count_logs(group_id=group_id)
         if group_id:
-            filtered_logs = [log for log in logs if log.get('group_id') == group_id]
-            print(f"Filtered logs by group_id {group_id}: {len(filtered_logs)} of {len(logs)} logs match")
-            logs = filtered_logs
-            
-        # Sort logs by timestamp (newest first)
-        logs = sorted(logs, key=lambda x: x.get('timestamp', ''), reverse=True)
+            logger.debug("Filtered logs by group_id %s: %d logs match", group_id, total_logs)
+        
+        if before or after:
+            result = _get_logs_by_cursor(store, per_page, group_id, before, after)
+            result.update(total=total_logs, page=None, pages=None)
+            logger.debug("Returning %d logs by cursor", len(result['items']))
+            return result
         
         # Calculate pagination
-        total_logs = len(logs)
         total_pages = math.ceil(total_logs / per_page) if total_logs > 0 else 1
         page = min(max(1, page), total_pages)
         
-        # Get logs for the requested page
+        # Get logs for the requested page (newest first); the first page of
+        # all logs is read straight from the end of the log
         start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        page_logs = logs[start_idx:end_idx] if logs else []
+        if not total_logs:
+            page_logs = []
+        elif page == 1 and not group_id:
+            page_logs = store.tail_logs(per_page)
+        else:
+            page_logs = store.query_logs(group_id=group_id, offset=start_idx, limit=per_page)
         
         result = {
             'items': page_logs,
             'total': total_logs,
             'page': page,
             'per_page': per_page,
-            'pages': total_pages
+            'pages': total_pages,
+            'newer': None,
+            'older': _encode_cursor(page_logs[-1]) if page_logs and page < total_pages else None
         }
-        print(f"Returning {len(page_logs)} logs for page {page} of {total_pages}")
+        if page_logs and page > 1:
+            result['newer'] = _encode_cursor(page_logs[0])
+        logger.debug("Returning %d logs for page %d of %d", len(page_logs), page, total_pages)
         return result
-    except Exception as e:
-        print(f"Error getting logs: {str(e)}")
+    except Exception:
+        logger.exception("Error getting logs")
         # Return a valid structure even on error
         return {
             'items': [],
             'total': 0,
             'page': 1,
             'per_page': per_page,
-            'pages': 0
+            'pages': 0,
+            'newer': None,
+            'older': None
         }
 
+def _time_bound(value, end=False):
+    """
+    Return the timestamp bound for a date or datetime string (ISO format).
+    An end date without a time covers that whole day.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+def search_logs(query=None, level=None, group_id=None, start=None, end=None, page=1, per_page=50):
+    """
+    Search log messages for a phrase
+    
+    The words of query must appear in the message in that order (case does
+    not matter). Uses the store's full-text index, so it costs about the
+    same however many logs there are.
+    
+    Args:
+        query (str, optional): Phrase to look for; None only applies the filters
+        level (str, optional): Only include entries of this level
+        group_id (str, optional): Only include entries of this group
+        start (str, optional): Earliest date or datetime (ISO format)
+        end (str, optional): Latest date (inclusive) or datetime (exclusive)
+        page (int): Page number (1-indexed)
+        per_page (int): Number of entries per page
+        
+    Returns:
+        dict: 'items' (newest first), 'page', 'per_page' and 'has_more'
+        
+    Raises:
+        ValueError: If start or end is not an ISO date or datetime
+    """
+    page = max(1, int(page))
+    per_page = max(1, int(per_page))
+    start, end = _time_bound(start), _time_bound(end, end=True)
+    try:
+        # One extra entry tells whether there is a next page
+        items = _get_log_sink().search_logs(query or None, level=level or None, group_id=group_id or None,
+                                            start=start, end=end, limit=per_page + 1,
+                                            offset=(page - 1) * per_page)
+    except Exception:
+        logger.exception("Error searching logs for %r", query)
+        items = []
+    return {
+        'items': items[:per_page],
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(items) > per_page
+    }
+
+def get_latest_logs(limit=5):
+    """
+    Get the newest log entries, newest first
+    
+    Only the last entries of the log are read and decoded, so this costs
+    the same however large the log is.
+    """
+    try:
+        return _get_log_sink().tail_logs(max(1, int(limit)))
+    except Exception:
+        logger.exception("Error getting latest logs")
+        return []
+
+def get_log_cursor(log_entry):
+    """Return the cursor of a log entry, as used by get_logs and get_logs_after"""
+    return _encode_cursor(log_entry)
+
+def is_log_cursor(cursor):
+    """Whether a string is a cursor made by get_log_cursor"""
+    try:
+        _decode_cursor(cursor)
+    except ValueError:
+        return False
+    return True
+
+def get_log_version():
+    """
+    Return a string that changes whenever log entries or run summaries
+    change, read from file metadata or a single row without loading any logs
+    """
+    return _get_log_sink().log_version()
+
+def get_logs_after(group_id, cursor=None, limit=100):
+    """
+    Get the log entries of a group that are newer than a cursor, oldest first
+    
+    Used to follow a run as it logs. Each entry carries its own cursor in
+    'cursor', to resume from after the last entry received.
+    
+    Args:
+        group_id (str): Group ID of the run
+        cursor (str, optional): Cursor of the last entry already seen; None
+            starts from the group's first entry
+        limit (int): Maximum number of entries to return
+        
+    Returns:
+        list: Log entries, oldest first
+        
+    Raises:
+        ValueError: If the cursor is not a valid log cursor
+    """
+    after = _decode_cursor(cursor) if cursor else ('', '')
+    items = _get_log_sink().query_logs(group_id=group_id, limit=limit, after=after)
+    return [dict(entry, cursor=_encode_cursor(entry)) for entry in reversed(items)]
+
+def _iter_logs(group_id, start, end, batch_size):
+    """Yield log entries oldest first, one batch at a time; see export_logs"""
+    store = _get_log_sink()
+    # Entries at exactly start sort after ('start', ''), as every entry has an id
+    after = (start or '', '')
+    while True:
+        items = store.query_logs(group_id=group_id, limit=batch_size, after=after)
+        for entry in reversed(items):
+            if end and entry.get('timestamp', '') >= end:
+                return
+            yield entry
+        if len(items) < batch_size:
+            return
+        after = (items[0].get('timestamp', ''), items[0].get('id', ''))
+
+def export_logs(group_id=None, start=None, end=None, batch_size=500):
+    """
+    Iterate over log entries oldest first, for exporting them
+
+    Entries are read batch_size at a time by cursor, so memory use stays the
+    same however many entries match, and entries written while the export
+    runs are included up to the end of the range.
+
+    Args:
+        group_id (str, optional): Only include entries of this group
+        start (str, optional): Earliest date or datetime (ISO format)
+        end (str, optional): Latest date (inclusive) or datetime (exclusive)
+        batch_size (int): Number of entries read from the store at once
+
+    Returns:
+        iterator: Log entries, oldest first
+
+    Raises:
+        ValueError: If start or end is not an ISO date or datetime (raised
+            here rather than while iterating)
+    """
+    start, end = _time_bound(start), _time_bound(end, end=True)
+    return _iter_logs(group_id or None, start, end, max(1, int(batch_size)))
+
+def wait_for_logs(timeout):
+    """
+    Wait until add_log writes an entry in this process, or timeout seconds
+    
+    Entries written by other worker processes don't wake the waiter, so
+    callers should still check for new entries after the timeout.
+    
+    Returns:
+        bool: True if an entry was written, False on timeout
+    """
+    with _log_written:
+        return _log_written.wait(timeout)
+
 def add_log(message, level='info', group_id=None):
     """
-    Add a log entry to the log file
+    Add a log entry to the log store
     
     Args:
         message (str): Log message
@@ -189,19 +485,6 @@ def add_log(message, level='info', group_id=None):
         dict: The log entry that was added
     """
     try:
-        # Load existing logs or create empty list
-        logs = []
-        if os.path.exists(LOGS_FILE):
-            try:
-                with open(LOGS_FILE, 'r') as f:
-                    logs = json.load(f)
-                print(f"Successfully loaded {len(logs)} existing logs from {LOGS_FILE}")
-            except json.JSONDecodeError:
-                print(f"JSON decode error when loading logs file. Creating new logs array.")
-                logs = []  # Reset logs if file is corrupted
-        else:
-            print(f"Logs file not found at {LOGS_FILE}. Creating new file.")
-        
         # Sanitize message for JSON compatibility
         if message is not None:
             # Limit message length
@@ -209,38 +492,28 @@ def add_log(message, level='info', group_id=None):
             # Replace control characters that would break JSON
             message = ''.join(c if ord(c) >= 32 or c in '\n\r\t' else ' ' for c in message)
         
-        # Create new log entry
+        # Create new log entry; the log sink sets its timestamp under its
+        # write lock, so entries reach the log in timestamp order
         log_entry = {
             'id': str(uuid.uuid4()),
             'message': message,
-            'level': level,
-            'timestamp': datetime.now().isoformat()
+            'level': level
         }
         
         # Add group_id if provided
         if group_id:
             log_entry['group_id'] = group_id
-            print(f"Adding log with group_id {group_id}: {message[:50]}...")
+            logger.debug("Adding log with group_id %s: %.50s...", group_id, message)
         else:
-            print(f"Adding log without group_id: {message[:50]}...")
-        
-        # Append new log
-        logs.append(log_entry)
+            logger.debug("Adding log without group_id: %.50s...", message)
         
-        # Sort logs by timestamp (newest first)
-        logs = sorted(logs, key=lambda x: x.get('timestamp', ''), reverse=True)
+        _get_log_sink().append_log(log_entry)
+        with _log_written:
+            _log_written.notify_all()
         
-        # Keep only the last 1000 logs to prevent file growth
-        logs = logs[:1000]
-        
-        # Write logs back to file
-        with open(LOGS_FILE, 'w') as f:
-            json.dump(logs, f, indent=4)
-        
-        print(f"Successfully saved {len(logs)} logs to {LOGS_FILE}")
         return log_entry
     except Exception as e:
-        print(f"Error adding log: {str(e)}")
+        logger.exception("Error adding log")
         return {
             'id': str(uuid.uuid4()),
             'message': f"Error adding log: {str(e)}",
@@ -248,109 +521,298 @@ def add_log(message, level='info', group_id=None):
             'timestamp': datetime.now().isoformat()
         }
 
+def get_runs(limit=10):
+    """
+    Get summaries of the latest bot runs, newest first
+    
+    Each summary has group_id, started_at, last_timestamp, account, city,
+    last_level, entry_count, error_count and status (running, completed
+    or failed).
+    """
+    return _get_store().get_runs(limit=limit)
+
+def get_run(group_id):
+    """Get the summary of one bot run, or None"""
+    return _get_store().get_run(group_id)
+
+def rebuild_run_summaries():
+    """Recreate every run summary from the stored logs; returns the number of runs"""
+    flush_logs()
+    return _get_store().rebuild_runs()
+
+def get_screenshots_dir():
+    """Return the directory screenshots are saved in"""
+    return SCREENSHOTS_DIR
+
+def get_screenshot_thumbnail(filename, width):
+    """
+    Return the path of a screenshot's thumbnail, making it on first request
+    
+    Args:
+        filename (str): Name of the screenshot
+        width (int): One of app.thumbnails.THUMBNAIL_WIDTHS
+        
+    Returns:
+        str: Path of the JPEG thumbnail, or None if the screenshot does not exist
+        
+    Raises:
+        ValueError: If the width or file name is not allowed
+    """
+    stored = _get_screenshots().resolve(filename)
+    if stored is None:
+        return None
+    # Keyed by the stored file, so identical screenshots share thumbnails
+    name = _thumbnails.get(stored, width)
+    return os.path.join(SCREENSHOT_THUMBNAILS_DIR, name) if name else None
+
+def resolve_screenshot(filename):
+    """
+    Return the name of the file in get_screenshots_dir() that holds a
+    screenshot, or None if there is no such screenshot
+    
+    Identical screenshots share one file named by its content hash; the
+    manifest maps each screenshot's name to it.
+    """
+    return _get_screenshots().resolve(filename)
+
+def _get_screenshot_sink():
+    """Return the screenshot sink, creating it on first use"""
+    global _screenshot_sink
+    if _screenshot_sink is None:
+        with _store_lock:
+            if _screenshot_sink is None:
+                from app.screenshot_sink import ScreenshotSink
+                _screenshot_sink = ScreenshotSink(SCREENSHOTS_DIR, on_saved=_screenshot_saved,
+                                                  image_format=SCREENSHOT_FORMAT, quality=SCREENSHOT_QUALITY)
+    return _screenshot_sink
+
+def _screenshot_saved(filename, blob, size, prefix=None, group_id=None):
+    """Record and log a screenshot once the sink has written it; False if it could not be recorded"""
+    if record_screenshot(filename, prefix=prefix, group_id=group_id, blob=blob) is None:
+        return False
+    add_log(f"Screenshot saved: {filename}", "info", group_id=group_id)
+    return True
+
+def save_screenshot(png, prefix, group_id=None):
+    """
+    Save a screenshot in the background
+    
+    The PNG is re-encoded (SCREENSHOT_FORMAT) and written by a worker
+    thread, which then records it in the manifest and logs
+    "Screenshot saved: <filename>" for the run. A screenshot identical to
+    one already stored only adds a record.
+    
+    Args:
+        png (bytes): PNG data, e.g. from driver.get_screenshot_as_png()
+        prefix (str): What the screenshot shows, e.g. 'login_page'
+        group_id (str, optional): Group ID of the bot run
+        
+    Returns:
+        str: Name of the screenshot (see resolve_screenshot)
+    """
+    return _get_screenshot_sink().save(png, prefix, group_id=group_id)
+
+def flush_screenshots():
+    """Wait until every screenshot passed to save_screenshot is written"""
+    if _screenshot_sink is not None:
+        _screenshot_sink.flush()
+
+def get_screenshot_sink_metrics():
+    """Return queue depth, sizes and encoding time of the screenshot sink"""
+    if _screenshot_sink is None:
+        return {'queue_depth': 0, 'saved': 0}
+    return _screenshot_sink.metrics()
+
+def record_screenshot(filename, prefix=None, group_id=None, blob=None):
+    """
+    Add a screenshot saved in the screenshots directory to the manifest
+    
+    Args:
+        filename (str): Name of the screenshot
+        prefix (str, optional): What the screenshot shows, e.g. 'login_page';
+            taken from the file name when not given
+        group_id (str, optional): Group ID of the bot run that took it
+        blob (str, optional): File in get_screenshots_dir() holding the
+            image; the file is filename itself when not given
+        
+    Returns:
+        dict: The manifest record, or None if it could not be written
+    """
+    try:
+        record = _get_screenshots().add(filename, group_id=group_id, prefix=prefix, blob=blob)
+        if record is None:
+            logger.warning("Screenshot %s was not found, so it was not recorded", filename)
+        return record
+    except Exception:
+        logger.exception("Error recording screenshot %s", filename)
+        return None
+
+def get_screenshots(page=1, per_page=24):
+    """
+    Get screenshots from the manifest, newest first, with pagination
+    
+    Returns:
+        dict: Dictionary with screenshot records and pagination information
+    """
+    page = max(1, int(page))
+    per_page = max(1, int(per_page))
+    try:
+        total = _get_screenshots().count()
+        pages = math.ceil(total / per_page) if total else 1
+        page = min(page, pages)
+        items, total = _get_screenshots().page(page, per_page)
+    except Exception:
+        logger.exception("Error getting screenshots")
+        items, total, pages = [], 0, 1
+    return {'items': items, 'total': total, 'page': page, 'per_page': per_page, 'pages': pages}
+
+def get_run_screenshots(group_id):
+    """
+    Get the screenshots of a bot run from the manifest's group_id index
+    
+    Returns:
+        list: Screenshot records, oldest first
+    """
+    try:
+        return _get_screenshots().for_group(group_id)
+    except Exception:
+        logger.exception("Error getting screenshots of group %s", group_id)
+        return []
+
+def _screenshot_group_id(filename):
+    """Return the group_id of the run that logged saving a screenshot, or None"""
+    items = _get_log_sink().search_logs(f"Screenshot saved: {filename}", limit=1)
+    return items[0].get('group_id') if items else None
+
+def rescan_screenshots():
+    """
+    Rebuild the screenshot manifest from the files in the screenshots
+    directory. Screenshots missing from the manifest get their run's
+    group_id from the "Screenshot saved" log entry, if it is still kept.
+    Screenshots stored under their own name (by earlier versions, or copied
+    in by hand) are moved into content-addressed files, so duplicates are
+    stored once.
+    
+    Returns:
+        dict: 'total' screenshots, 'added' files that were not recorded,
+        'removed' records whose file was gone and 'moved' files that were
+        moved into content-addressed ones
+    """
+    total, added, removed, moved = _get_screenshots().rescan(find_group_id=_screenshot_group_id)
+    # Their thumbnails were keyed by the old file
+    for name in moved:
+        _thumbnails.remove(name)
+    logger.info("Rescanned screenshots: %d in manifest, %d added, %d removed, %d moved",
+                total, added, removed, len(moved))
+    return {'total': total, 'added': added, 'removed': removed, 'moved': len(moved)}
+
+def sweep_screenshots(dry_run=False):
+    """
+    Delete screenshots past the retention limits in config
+    (SCREENSHOT_RETENTION_DAYS, SCREENSHOT_FAILED_RETENTION_DAYS,
+    SCREENSHOT_RETENTION_COUNT and SCREENSHOT_RETENTION_BYTES), with their
+    thumbnails
+    
+    Screenshots of failed runs are kept for SCREENSHOT_FAILED_RETENTION_DAYS
+    and are the last to go when over the count or size limit.
+    
+    Args:
+        dry_run (bool): Only report what would be deleted
+        
+    Identical screenshots share a file, which is deleted with the last of
+    them.
+    
+    Returns:
+        dict: 'deleted' screenshots, 'bytes' reclaimed (the recorded sizes of
+        the files that would go when dry_run), 'remaining' screenshots and
+        'remaining_bytes'
+    """
+    manifest = _get_screenshots()
+    # Oldest first; runs that overlap may have recorded out of order
+    records = sorted(manifest.all(), key=lambda record: (record['timestamp'], record['filename']))
+    failed_groups = {run['group_id'] for run in get_runs(limit=None) if run.get('status') == 'failed'}
+    expired = select_expired(records, datetime.now(),
+                             max_age_days=SCREENSHOT_RETENTION_DAYS,
+                             max_count=SCREENSHOT_RETENTION_COUNT,
+                             max_bytes=SCREENSHOT_RETENTION_BYTES,
+                             failed_groups=failed_groups,
+                             failed_max_age_days=SCREENSHOT_FAILED_RETENTION_DAYS)
+    names = [record['filename'] for record in expired]
+    expired_names = set(names)
+    remaining = [record for record in records if record['filename'] not in expired_names]
+    remaining_bytes = stored_bytes(remaining)
+    if dry_run:
+        freed = stored_bytes(records) - remaining_bytes
+    else:
+        freed, deleted = manifest.remove(names)
+        freed += sum(_thumbnails.remove(name) for name in deleted)
+    result = {
+        'deleted': len(names),
+        'bytes': freed,
+        'remaining': len(remaining),
+        'remaining_bytes': remaining_bytes
+    }
+    if names and not dry_run:
+        logger.info("Screenshot retention deleted %d screenshots (%d bytes); %d remain (%d bytes)",
+                    result['deleted'], result['bytes'], result['remaining'], result['remaining_bytes'])
+    return result
+
+def start_screenshot_sweeper():
+    """Start sweeping screenshots every SCREENSHOT_SWEEP_INTERVAL seconds in this process (once)"""
+    global _screenshot_sweeper
+    if SCREENSHOT_SWEEP_INTERVAL <= 0:
+        return
+    with _store_lock:
+        if _screenshot_sweeper is None:
+            _screenshot_sweeper = ScreenshotSweeper(sweep_screenshots, SCREENSHOT_SWEEP_INTERVAL)
+            _screenshot_sweeper.start()
+
 def get_settings():
     """Get application settings"""
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            return json.load(f)
-    return {
-        "run_interval": 30,
-        "max_posts_per_day": 10,
-        "timeout_between_actions": 5,
-        "enable_random_delays": True
-    }
+    return _get_store().get_settings(dict(DEFAULT_SETTINGS))
 
 def update_settings(settings_data):
     """Update application settings"""
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(settings_data, f, indent=4)
+    _get_store().save_settings(settings_data)
     return settings_data
 
 def get_account_by_id(account_id):
     """Get an account by its ID"""
-    accounts = get_accounts()
-    for account in accounts:
-        if account['id'] == account_id:
-            return account
-    return None
+    return _get_store().get('accounts', account_id)
 
 def get_city_by_id(city_id):
     """Get city by ID"""
-    cities = get_cities()
-    for city in cities:
-        if city['id'] == city_id:
-            return city
-    return None
+    return _get_store().get('cities', city_id)
 
 def get_message_by_id(message_id):
     """Get message by ID"""
-    messages = get_messages()
-    for message in messages:
-        if message['id'] == message_id:
-            return message
-    return None
+    return _get_store().get('messages', message_id)
 
 def update_account_last_used(account_id):
     """Update last_used timestamp for account"""
-    accounts = get_accounts()
-    for account in accounts:
-        if account['id'] == account_id:
-            account['last_used'] = datetime.utcnow().isoformat()
-            break
-    
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accounts, f, indent=4)
+    _get_store().update('accounts', account_id, {'last_used': datetime.utcnow().isoformat()})
 
 def delete_account(account_id):
     """Delete an account by ID"""
-    accounts = get_accounts()
-    accounts = [account for account in accounts if account['id'] != account_id]
-    with open(ACCOUNTS_FILE, 'w') as f:
-        json.dump(accounts, f, indent=4)
+    _get_store().delete('accounts', account_id)
     return True
 
 def delete_city(city_id):
     """Delete a city by ID"""
-    cities = get_cities()
-    cities = [city for city in cities if city['id'] != city_id]
-    with open(CITIES_FILE, 'w') as f:
-        json.dump(cities, f, indent=4)
+    _get_store().delete('cities', city_id)
     return True
 
 def delete_message(message_id):
     """Delete a message by ID"""
-    messages = get_messages()
-    # Find the message to delete and get its image filename if it exists
-    image_to_delete = None
-    for message in messages:
-        if message['id'] == message_id and message.get('image'):
-            image_to_delete = message['image']
-            break
-    
-    # Filter out the message to be deleted
-    messages = [message for message in messages if message['id'] != message_id]
-    
-    with open(MESSAGES_FILE, 'w') as f:
-        json.dump(messages, f, indent=4)
-    
+    message = _get_store().delete('messages', message_id)
     # Return the image filename if it exists, so it can be deleted from the filesystem
-    return image_to_delete
+    return message.get('image') if message else None
 
 def delete_schedule(schedule_id):
     """Delete a schedule by ID"""
-    schedules = get_schedules()
-    schedules = [schedule for schedule in schedules if schedule['id'] != schedule_id]
-    with open(SCHEDULES_FILE, 'w') as f:
-        json.dump(schedules, f, indent=4)
+    _get_store().delete('schedules', schedule_id)
     return True
 
 def update_last_used(account_id):
     """Update the last_used timestamp for an account"""
-    accounts = get_accounts()
-    for account in accounts:
-        if account['id'] == account_id:
-            account['last_used'] = datetime.utcnow().isoformat()
-            with open(ACCOUNTS_FILE, 'w') as f:
-                json.dump(accounts, f, indent=4)
-            return True
-    return False 
\ No newline at end of file
+    return _get_store().update('accounts', account_id, {'last_used': datetime.utcnow().isoformat()}) 
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: callers only get their in-process locks
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, exclusive=True):
+    """
+    Hold an advisory lock on path across processes.
+
+    The lock file is created if needed and never replaced, so it can guard
+    data files that are themselves swapped out with os.replace.
+
+    Args:
+        path (str): Path of the lock file
+        exclusive (bool): Exclusive (writer) lock, or shared (reader) lock
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from app.file_lock import file_lock
+
+
+class JsonStore:
+    """
+    Storage backend that keeps each collection in its own JSON file and
+    the logs in an append-only JsonlLogStore.
+
+    Parsed files are cached in-process and only re-read when the file
+    changes. Every write replaces the whole file atomically (temp file and
+    rename), so readers never see a half-written file and need no lock.
+    Read-modify-write updates hold an exclusive lock on <file>.lock for the
+    whole cycle, so writers in different threads and worker processes
+    never overwrite each other's changes.
+    """
+
+    def __init__(self, collection_files, settings_file, log_store):
+        self.collection_files = collection_files
+        self.settings_file = settings_file
+        self.log_store = log_store
+        # file path -> ((inode, mtime_ns, size), parsed data, id index)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        # Serialises writers in this process where file locks are unavailable
+        self._write_lock = threading.RLock()
+
+    # ------------------------------
+    # Cached file access
+    # ------------------------------
+    @staticmethod
+    def _file_signature(path):
+        """Return the (inode, mtime_ns, size) used to validate cached file contents"""
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _copy_data(data):
+        """
+        Return a copy of cached data that callers are free to modify.
+
+        Records are flat dicts of JSON scalars, so copying each dict is enough
+        to keep in-place edits (e.g. routes converting dates) out of the cache.
+        """
+        if isinstance(data, list):
+            return [dict(item) if isinstance(item, dict) else item for item in data]
+        if isinstance(data, dict):
+            return dict(data)
+        return data
+
+    @staticmethod
+    def _build_index(data):
+        """
+        Map each record id of a collection to its record, or return None for
+        files that are not collections. The first record with an id wins, as
+        it did for a linear scan.
+        """
+        if not isinstance(data, list):
+            return None
+        index = {}
+        for record in data:
+            if isinstance(record, dict) and 'id' in record:
+                index.setdefault(record['id'], record)
+        return index
+
+    def _read(self, path, default, fresh=False):
+        """
+        Return the parsed contents of a data file and its id index, reusing
+        the cached parse while the file is unchanged.
+
+        The cached objects are shared and must not be modified. A fresh read,
+        as writers do under the lock, always parses the file and returns
+        private objects that the writer may modify and hand to _save_json.
+
+        Returns:
+            tuple: (data, index), or (default, None) if the file does not exist
+        """
+        try:
+            signature = self._file_signature(path)
+        except FileNotFoundError:
+            with self._cache_lock:
+                self._cache.pop(path, None)
+            return default, None
+
+        if not fresh:
+            with self._cache_lock:
+                cached = self._cache.get(path)
+            if cached is not None and cached[0] == signature:
+                return cached[1], cached[2]
+
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = self._build_index(data)
+        if not fresh:
+            with self._cache_lock:
+                self._cache[path] = (signature, data, index)
+        return data, index
+
+    def _load_json(self, path, default):
+        """Load a JSON data file; returns a copy the caller may modify"""
+        data, _ = self._read(path, default)
+        return self._copy_data(data)
+
+    @contextmanager
+    def _locked(self, path):
+        """Hold the exclusive write lock of a data file"""
+        with self._write_lock, file_lock(path + '.lock', exclusive=True):
+            yield
+
+    def _save_json(self, path, data, index=None):
+        """
+        Replace a JSON data file atomically and make data and index its cache
+        entry; the caller must not modify them afterwards. Caller holds the
+        file's write lock.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if index is None:
+            index = self._build_index(data)
+        with self._cache_lock:
+            self._cache[path] = (self._file_signature(path), data, index)
+
+    def clear_cache(self):
+        """Drop every cached file so the next read goes to disk"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ------------------------------
+    # Collections
+    # ------------------------------
+    def list(self, collection):
+        """Return every record of a collection in insertion order"""
+        return self._load_json(self.collection_files[collection], [])
+
+    def get(self, collection, record_id):
+        """Return the record with the given id, or None"""
+        _, index = self._read(self.collection_files[collection], [])
+        record = index.get(record_id) if index else None
+        return dict(record) if record is not None else None
+
+    def insert(self, collection, record):
+        """Append a record to a collection"""
+        path = self.collection_files[collection]
+        record = dict(record)
+        with self._locked(path):
+            records, index = self._read(path, [], fresh=True)
+            index = index if index is not None else {}
+            records.append(record)
+            index.setdefault(record['id'], record)
+            self._save_json(path, records, index)
+
+    def update(self, collection, record_id, fields):
+        """Update fields of a record; returns False if it does not exist"""
+        path = self.collection_files[collection]
+        with self._locked(path):
+            records, index = self._read(path, [], fresh=True)
+            record = index.get(record_id) if index else None
+            if record is None:
+                return False
+            record.update(fields)
+            self._save_json(path, records, index)
+            return True
+
+    def delete(self, collection, record_id):
+        """Delete a record; returns the deleted record or None"""
+        path = self.collection_files[collection]
+        with self._locked(path):
+            records, index = self._read(path, [], fresh=True)
+            deleted = index.pop(record_id, None) if index else None
+            if deleted is None:
+                return None
+            records = [record for record in records if record is not deleted]
+            self._save_json(path, records, index)
+            return dict(deleted)
+
+    # ------------------------------
+    # Settings
+    # ------------------------------
+    def get_settings(self, default):
+        return self._load_json(self.settings_file, default)
+
+    def save_settings(self, settings_data):
+        with self._locked(self.settings_file):
+            self._save_json(self.settings_file, self._copy_data(settings_data))
+
+    # ------------------------------
+    # Logs
+    # ------------------------------
+    def append_log(self, log_entry):
+        self.log_store.append(log_entry)
+
+    def append_logs(self, log_entries):
+        self.log_store.append_many(log_entries)
+
+    def count_logs(self, group_id=None):
+        """Return the number of log entries, optionally only those of one group"""
+        return self.log_store.count(group_id=group_id)
+
+    def query_logs(self, group_id=None, offset=0, limit=None, before=None, after=None):
+        """Return log entries newest first, optionally before or after a (timestamp, id) cursor"""
+        return self.log_store.query(group_id=group_id, offset=offset, limit=limit, before=before, after=after)
+
+    def search_logs(self, query=None, level=None, group_id=None, start=None, end=None, limit=50, offset=0):
+        """Return log entries whose message contains a phrase, newest first"""
+        return self.log_store.search(query, level=level, group_id=group_id, start=start, end=end,
+                                     limit=limit, offset=offset)
+
+    def tail_logs(self, limit):
+        """Return the newest log entries, reading backwards from the end of the log"""
+        return self.log_store.tail(limit)
+
+    def log_version(self):
+        """Return a string that changes whenever logs or run summaries change"""
+        return self.log_store.version()
+
+    def get_runs(self, limit=10):
+        """Return the summaries of the latest runs, newest first"""
+        return self.log_store.get_runs(limit=limit)
+
+    def get_run(self, group_id):
+        return self.log_store.get_run(group_id)
+
+    def rebuild_runs(self):
+        return self.log_store.rebuild_runs()
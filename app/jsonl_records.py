@@ -0,0 +1,196 @@
+import itertools
+import json
+import logging
+import os
+import threading
+
+from app.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlRecordFile:
+    """
+    Append-only JSONL file of records keyed by one field.
+
+    Writing a record appends one line; the last line for a key wins and a
+    line with "_deleted": true removes the key. Records are kept in memory
+    in the order their keys first appeared, and each read only parses lines
+    added since the previous one, so other processes' writes are picked up
+    cheaply. The file is compacted once it holds more than twice as many
+    lines as live records.
+
+    Fields named in index are indexed in memory as the lines are loaded, so
+    find() returns the records with a given value without a scan.
+    """
+
+    def __init__(self, path, key, index=()):
+        self.path = path
+        self.key = key
+        self.index = tuple(index)
+        self.lock_path = path + '.lock'
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self._records = {}
+        # {field: {value: {key: None}}}; the inner dicts are ordered sets
+        self._indexes = {field: {} for field in self.index}
+        self._lines = 0
+        self._offset = 0
+        self._inode = inode
+
+    def _unindex(self, record):
+        for field, values in self._indexes.items():
+            keys = values.get(record.get(field))
+            if keys is not None:
+                keys.pop(record[self.key], None)
+                if not keys:
+                    del values[record.get(field)]
+
+    def _load(self, record):
+        """Apply one line to the records and indexes"""
+        old = self._records.get(record[self.key])
+        if old is not None:
+            self._unindex(old)
+        if record.get('_deleted'):
+            self._records.pop(record[self.key], None)
+            return
+        self._records[record[self.key]] = record
+        for field, values in self._indexes.items():
+            values.setdefault(record.get(field), {})[record[self.key]] = None
+
+    def _refresh(self):
+        """Load lines written since the last read. Caller holds the file lock."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset(None)
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._reset(stat.st_ino)
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt line in %s", self.path)
+                continue
+            self._lines += 1
+            self._load(record)
+        self._offset += end
+
+    def _append(self, records):
+        """Append records and load them. Caller holds the exclusive file lock."""
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self._refresh()
+        if self._lines > 2 * len(self._records) + 100:
+            self._write_all(list(self._records.values()))
+
+    def _write_all(self, records):
+        """Replace the file with the given records. Caller holds the exclusive file lock."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        os.replace(tmp_path, self.path)
+        self._reset(None)
+        self._refresh()
+
+    # ------------------------------
+    # Public API
+    # ------------------------------
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get(self, key):
+        """Return the record for key, or None"""
+        with self._lock, file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+            record = self._records.get(key)
+            return dict(record) if record is not None else None
+
+    def get_many(self, keys):
+        """Return {key: record} for the keys that exist"""
+        with self._lock, file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+            return {key: dict(self._records[key]) for key in keys if key in self._records}
+
+    def values(self, newest_first=False, limit=None, offset=0):
+        """Return records in the order their keys were first written, skipping the first offset"""
+        with self._lock, file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+            records = reversed(self._records.values()) if newest_first else iter(self._records.values())
+            records = itertools.islice(records, offset, None)
+            result = []
+            for record in records:
+                if limit is not None and len(result) >= limit:
+                    break
+                result.append(dict(record))
+            return result
+
+    def find(self, field, value):
+        """Return the records whose field (one of index) equals value, in the order they got it"""
+        with self._lock, file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+            return [dict(self._records[key]) for key in self._indexes[field].get(value, ())]
+
+    def count(self):
+        with self._lock, file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+            return len(self._records)
+
+    def put_many(self, records):
+        """Insert or replace records"""
+        if not records:
+            return
+        with self._lock, file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            self._append(records)
+
+    def update_many(self, update):
+        """
+        Read-modify-write under the exclusive lock.
+
+        Args:
+            update: Called with a dict of the current records (do not modify
+                it); returns the records to insert or replace
+        """
+        with self._lock, file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            records = update(self._records)
+            if records:
+                self._append(records)
+
+    def delete_many(self, keys):
+        """Remove records by key"""
+        with self._lock, file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            tombstones = [{self.key: key, '_deleted': True} for key in keys if key in self._records]
+            if tombstones:
+                self._append(tombstones)
+
+    def replace_all(self, records):
+        """Replace every record with the given ones"""
+        with self._lock, file_lock(self.lock_path, exclusive=True):
+            self._write_all(records)
+
+    def rewrite(self, build):
+        """
+        Replace every record under the exclusive lock.
+
+        Args:
+            build: Called with a dict of the current records (do not modify
+                it); returns the new records, in order
+        """
+        with self._lock, file_lock(self.lock_path, exclusive=True):
+            self._refresh()
+            self._write_all(build(self._records))
@@ -0,0 +1,219 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Words as FTS5's default unicode61 tokenizer sees them: runs of letters and
+# digits (underscores and punctuation separate tokens)
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Search rowids of the JSONL index are (day ordinal << DAY_SHIFT) + line
+# number, so rowid order is log order and a day is one rowid range
+DAY_SHIFT = 24
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY,
+    id TEXT,
+    message TEXT,
+    level TEXT,
+    timestamp TEXT,
+    group_id TEXT
+);
+-- Lists entries of one level newest first without a text query
+CREATE INDEX IF NOT EXISTS idx_entries_level_seq ON entries (level, seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(message, content='entries', content_rowid='seq');
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, message) VALUES (new.seq, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, message) VALUES ('delete', old.seq, old.message);
+END;
+"""
+
+
+def tokenize(text):
+    """Return the lowercased words of a text"""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+def phrase_query(text):
+    """
+    Return an FTS5 query that matches text as a phrase, or None if it has no
+    words. Every word must appear, in order and next to each other, so
+    "Login failed" or a URL match as typed; quotes and operators in the
+    text are ignored.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    return '"' + ' '.join(tokens) + '"'
+
+
+def matches(entry, tokens, level=None, group_id=None, start=None, end=None):
+    """
+    Whether a log entry matches a search, for entries that are not in an
+    index yet (e.g. queued by the batched writer).
+
+    Args:
+        tokens (list): Words of the search phrase, from tokenize()
+        start, end (str, optional): Timestamp range, start inclusive and
+            end exclusive
+    """
+    if level and entry.get('level') != level:
+        return False
+    if group_id and entry.get('group_id') != group_id:
+        return False
+    timestamp = entry.get('timestamp') or ''
+    if (start and timestamp < start) or (end and timestamp >= end):
+        return False
+    if not tokens:
+        return True
+    words = tokenize(entry.get('message'))
+    width = len(tokens)
+    return any(words[i:i + width] == tokens for i in range(len(words) - width + 1))
+
+
+def search_filter(column_prefix='', level=None, group_id=None, start=None, end=None):
+    """Return SQL conditions and parameters for the non-text search filters"""
+    conditions, params = [], []
+    if level:
+        conditions.append(f'{column_prefix}level = ?')
+        params.append(level)
+    if group_id:
+        conditions.append(f'{column_prefix}group_id = ?')
+        params.append(group_id)
+    if start:
+        conditions.append(f'{column_prefix}timestamp >= ?')
+        params.append(start)
+    if end:
+        conditions.append(f'{column_prefix}timestamp < ?')
+        params.append(end)
+    return conditions, params
+
+
+def _day_range(day):
+    """Return the first rowid of a day and the first rowid after it"""
+    first = date.fromisoformat(day).toordinal() << DAY_SHIFT
+    return first, first + (1 << DAY_SHIFT)
+
+
+class LogSearchIndex:
+    """
+    Full-text index of the JSONL log segments, kept in a SQLite FTS5
+    database next to them (search.sqlite).
+
+    Each entry is stored under a rowid made of its segment's day and line
+    number. The log store adds entries as it appends them; catching up with
+    lines the index is missing (logs written before the index existed, or a
+    write interrupted between the segment and the index) is done by the
+    store before each search. Entries are only inserted if their rowid is
+    not taken, so several processes may add the same lines.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, day, first_line, entries):
+        """Index entries that are lines first_line, first_line + 1, ... of a day's segment"""
+        seq = _day_range(day)[0] + first_line
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO entries (seq, id, message, level, timestamp, group_id) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(seq + i, entry.get('id'), entry.get('message'), entry.get('level'),
+                  entry.get('timestamp'), entry.get('group_id')) for i, entry in enumerate(entries)]
+            )
+
+    def indexed_lines(self, day):
+        """Return the number of lines of a day the index covers"""
+        first, after = _day_range(day)
+        last = self._connect().execute(
+            'SELECT MAX(seq) FROM entries WHERE seq >= ? AND seq < ?', (first, after)
+        ).fetchone()[0]
+        return 0 if last is None else last - first + 1
+
+    def forget(self, days):
+        """Remove the entries of the given days"""
+        conn = self._connect()
+        with conn:
+            for day in days:
+                conn.execute('DELETE FROM entries WHERE seq >= ? AND seq < ?', _day_range(day))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM entries')
+
+    def size(self):
+        """Return the bytes the index takes on disk, with its WAL files"""
+        total = 0
+        for path in (self.db_path, self.db_path + '-wal', self.db_path + '-shm'):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def compact(self):
+        """Give the space of removed entries back to the disk"""
+        conn = self._connect()
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def search(self, query=None, level=None, group_id=None, start=None, end=None, limit=50, offset=0):
+        """
+        Return matching entries newest first.
+
+        Args:
+            query (str, optional): Phrase to look for in the messages; None
+                lists every entry that passes the other filters
+            level, group_id (str, optional): Exact filters
+            start, end (str, optional): Timestamp range, start inclusive and
+                end exclusive
+        """
+        match = phrase_query(query) if query else None
+        if query and not match:
+            # Only punctuation: nothing can match
+            return []
+        if match:
+            sql = 'SELECT e.* FROM entries_fts f JOIN entries e ON e.seq = f.rowid WHERE entries_fts MATCH ?'
+            params = [match]
+            seq = 'f.rowid'
+        else:
+            sql = 'SELECT e.* FROM entries e WHERE 1'
+            params = []
+            seq = 'e.seq'
+        conditions, filter_params = search_filter('e.', level, group_id, start, end)
+        params += filter_params
+        # Segments of days before the range are skipped by rowid (an entry is
+        # never in a segment older than its own day, so this is safe for start only)
+        if start and len(start) >= 10:
+            conditions.append(f'{seq} >= ?')
+            params.append(_day_range(start[:10])[0])
+        for condition in conditions:
+            sql += f' AND {condition}'
+        sql += f' ORDER BY {seq} DESC LIMIT ? OFFSET ?'
+        rows = self._connect().execute(sql, params + [-1 if limit is None else limit, offset])
+        return [{key: row[key] for key in ('id', 'message', 'level', 'timestamp', 'group_id') if row[key] is not None}
+                for row in rows]
@@ -0,0 +1,935 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from app.file_lock import file_lock
+from app.jsonl_records import JsonlRecordFile
+from app.log_search import LogSearchIndex
+from app.run_summaries import apply_entries
+
+logger = logging.getLogger(__name__)
+
+# Segment files are named after the day their entries were logged on
+SEGMENT_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$')
+DAY_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+# Closed segments whose index and data are kept in memory per process
+MAX_LOADED_SEGMENTS = 4
+
+# Bytes read per step when reading a segment backwards from its end
+TAIL_BLOCK_SIZE = 8 * 1024
+
+
+def _entry_day(entry):
+    """Return the day (YYYY-MM-DD) an entry belongs to, from its timestamp"""
+    timestamp = entry.get('timestamp') if isinstance(entry, dict) else None
+    if isinstance(timestamp, str) and DAY_PATTERN.match(timestamp):
+        return timestamp[:10]
+    return date.today().isoformat()
+
+
+def _tail_lines(path, limit):
+    """
+    Return up to limit complete lines from the end of a file, last line
+    first, reading backwards in blocks so the cost depends on the lines
+    returned rather than the size of the file.
+    """
+    lines = []
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        # Start of the earliest line read so far, which may continue in the previous block
+        partial = b''
+        # Bytes after the last newline are a write still in progress
+        found_end = False
+        while position > 0 and len(lines) < limit:
+            size = min(TAIL_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            chunk = f.read(size) + partial
+            if not found_end:
+                end = chunk.rfind(b'\n')
+                if end == -1:
+                    continue
+                chunk = chunk[:end]
+                found_end = True
+            pieces = chunk.split(b'\n')
+            partial = pieces.pop(0)
+            lines.extend(reversed(pieces))
+        if position == 0 and partial:
+            lines.append(partial)
+    return [line for line in lines if line][:limit]
+
+
+class LogSegment:
+    """
+    One day of log entries: <day>.jsonl while it is written to, and
+    <day>.jsonl.gz once closed.
+
+    A sidecar index (<day>.idx) records the byte offset (in the uncompressed
+    data), length, timestamp and group_id of every line and is appended to
+    together with the log. Reads look up the lines they need in the index
+    and seek straight to them. A closed segment is decompressed in one go
+    the first time it is read.
+
+    Lines are written in roughly timestamp order, but writers in other
+    threads or processes may append an entry after a newer one. Reads
+    therefore address entries by their position in timestamp order (ties
+    broken by write order), which the in-memory index keeps: appends in
+    order extend it, and an entry that arrives out of order makes it be
+    sorted again.
+
+    Callers hold the store's file lock around every method.
+    """
+
+    def __init__(self, directory, day):
+        self.day = day
+        self.path = os.path.join(directory, day + '.jsonl')
+        self.gz_path = self.path + '.gz'
+        self.index_path = os.path.join(directory, day + '.idx')
+        self.unload()
+
+    def unload(self):
+        """Drop the in-memory index and data"""
+        # (offset, length), timestamp and group_id of every line, in write order
+        self._positions = []
+        self._timestamps = []
+        self._line_groups = []
+        # Line numbers in timestamp order, and their timestamps, for
+        # locating (timestamp, id) cursors
+        self._order = []
+        self._sorted_timestamps = []
+        # group_id -> positions in _order of that group's lines, oldest first
+        self._groups = {}
+        # Bytes of the log covered by the index, and bytes of the index read
+        self._indexed_upto = 0
+        self._index_offset = 0
+        self._inode = None
+        self._closed = False
+        self._data = None
+        # (inode, bytes, lines) of the index file counted by count()
+        self._counted = (None, 0, 0)
+
+    @property
+    def closed(self):
+        """Whether the segment was compressed, as of the last refresh"""
+        return self._closed
+
+    def size(self):
+        """Return the bytes the segment takes on disk"""
+        total = 0
+        for path in (self.path, self.gz_path, self.index_path):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    @staticmethod
+    def _index_line(offset, length, entry):
+        if not isinstance(entry, dict):
+            entry = {}
+        # ISO timestamps may use a space as separator; the index splits on spaces
+        timestamp = str(entry.get('timestamp') or '-').replace(' ', 'T')
+        return f"{offset} {length} {timestamp} {entry.get('group_id') or '-'}\n".encode('utf-8')
+
+    # ------------------------------
+    # Index maintenance
+    # ------------------------------
+    def refresh(self):
+        """Load index lines written since the last read"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._refresh_closed()
+            return
+
+        # The log was replaced (reset) or truncated: start over
+        if stat.st_ino != self._inode or stat.st_size < self._indexed_upto:
+            self.unload()
+            self._inode = stat.st_ino
+        if stat.st_size != self._indexed_upto:
+            self._load_index()
+
+    def _refresh_closed(self):
+        try:
+            stat = os.stat(self.gz_path)
+        except FileNotFoundError:
+            # Removed by retention or a reset
+            self.unload()
+            return
+        if stat.st_ino != self._inode:
+            self.unload()
+            self._inode = stat.st_ino
+            self._closed = True
+            self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(self._index_offset)
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        # Leave a partially written last line for the next read
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            fields = line.decode('utf-8').split(' ', 3)
+            if len(fields) != 4 or int(fields[0]) != self._indexed_upto:
+                # Out of step with the log; catch_up re-indexes from the log
+                continue
+            offset, length, timestamp, group_id = fields
+            self._add_position(int(offset), int(length), '' if timestamp == '-' else timestamp,
+                               None if group_id == '-' else group_id)
+        self._index_offset += end
+        if len(self._order) < len(self._positions):
+            self._sort()
+
+    def _add_position(self, offset, length, timestamp, group_id):
+        line_number = len(self._positions)
+        self._positions.append((offset, length))
+        self._timestamps.append(timestamp)
+        self._line_groups.append(group_id)
+        self._indexed_upto = offset + length
+        # In order so far: extend the order; otherwise _load_index sorts it
+        if len(self._order) == line_number and (not self._order or timestamp >= self._sorted_timestamps[-1]):
+            if group_id:
+                self._groups.setdefault(group_id, []).append(len(self._order))
+            self._order.append(line_number)
+            self._sorted_timestamps.append(timestamp)
+
+    def _sort(self):
+        """Rebuild the timestamp order after a line arrived out of order"""
+        self._order = sorted(range(len(self._positions)), key=lambda line: (self._timestamps[line], line))
+        self._sorted_timestamps = [self._timestamps[line] for line in self._order]
+        self._groups = {}
+        for position, line in enumerate(self._order):
+            group_id = self._line_groups[line]
+            if group_id:
+                self._groups.setdefault(group_id, []).append(position)
+
+    def catch_up(self):
+        """Index log lines the index does not cover yet (e.g. after a crash). Caller holds the exclusive lock."""
+        self.refresh()
+        if self._closed:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._indexed_upto)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        index_lines = []
+        offset = self._indexed_upto
+        for line in data[:end].splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt log line in %s", self.path)
+                entry = None
+            index_lines.append(self._index_line(offset, len(line), entry))
+            offset += len(line)
+        self._append_index(index_lines)
+
+    def _append_index(self, index_lines):
+        with open(self.index_path, 'ab') as f:
+            f.write(b''.join(index_lines))
+        self.refresh()
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def lines(self, group_id=None):
+        """Positions (in timestamp order) of the segment's entries, or of one group's, oldest first"""
+        if not group_id:
+            return range(len(self._positions))
+        return self._groups.get(group_id, [])
+
+    def count(self):
+        """
+        Return the number of entries. Without a loaded index this counts the
+        lines of the index file rather than loading it.
+        """
+        if self._positions:
+            self.refresh()
+            return len(self._positions)
+        inode, offset, count = self._counted
+        try:
+            with open(self.index_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                # Only the lines appended since the last count are read
+                if stat.st_ino != inode or stat.st_size < offset:
+                    offset = count = 0
+                f.seek(offset)
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    count += chunk.count(b'\n')
+                    offset += len(chunk)
+        except FileNotFoundError:
+            return 0
+        self._counted = (stat.st_ino, offset, count)
+        return count
+
+    def _raw_lines(self, line_numbers):
+        if self._closed:
+            if self._data is None:
+                with gzip.open(self.gz_path, 'rb') as f:
+                    self._data = f.read()
+            for line_number in line_numbers:
+                offset, length = self._positions[line_number]
+                yield self._data[offset:offset + length]
+            return
+        with open(self.path, 'rb') as f:
+            for line_number in line_numbers:
+                offset, length = self._positions[line_number]
+                f.seek(offset)
+                yield f.read(length)
+
+    def tail(self, limit):
+        """
+        Decode the newest limit entries, newest first. Without a loaded index
+        this reads the last lines written, sorted, which can miss an entry
+        written out of order further back.
+        """
+        if self._positions:
+            self.refresh()
+        if self._positions:
+            count = len(self._order)
+            return self.read_lines(range(count - 1, max(0, count - limit) - 1, -1))
+        if os.path.exists(self.path):
+            try:
+                lines = _tail_lines(self.path, limit)
+            except FileNotFoundError:
+                lines = []
+        else:
+            try:
+                with gzip.open(self.gz_path, 'rb') as f:
+                    lines = f.read().splitlines()[::-1][:limit]
+            except FileNotFoundError:
+                lines = []
+        entries = self._decode(lines)
+        entries.sort(key=lambda entry: (str(entry.get('timestamp') or ''), str(entry.get('id') or '')),
+                     reverse=True)
+        return entries
+
+    def _decode(self, lines):
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt log line in %s", self.path)
+        return entries
+
+    def read_lines(self, positions):
+        """Decode the entries at the given positions in timestamp order"""
+        if not self._positions:
+            return []
+        return self._decode(self._raw_lines(self._order[position] for position in positions))
+
+    def read_written(self, line_numbers):
+        """Decode the given lines, numbered in write order"""
+        if not self._positions:
+            return []
+        return self._decode(self._raw_lines(line_numbers))
+
+    def cursor_line(self, cursor):
+        """
+        Return the position (in timestamp order) of the entry a (timestamp,
+        id) cursor points at. If that entry is gone (or the cursor is a bare
+        timestamp with an empty id), return a position half a line before the
+        first entry of its timestamp, so entries at that timestamp count as
+        newer than it.
+
+        The cursor's timestamp is found by bisection and only the entries
+        sharing it are read to match the id.
+        """
+        timestamp, entry_id = cursor
+        lo = bisect_left(self._sorted_timestamps, timestamp)
+        hi = bisect_right(self._sorted_timestamps, timestamp, lo)
+        for position, entry in zip(range(lo, hi), self.read_lines(range(lo, hi))):
+            if entry.get('id') == entry_id:
+                return position
+        return lo - 0.5
+
+    def stats(self):
+        """Return the manifest record of the segment"""
+        return {
+            'day': self.day,
+            'entries': len(self._positions),
+            'first_timestamp': self._sorted_timestamps[0] if self._sorted_timestamps else None,
+            'last_timestamp': self._sorted_timestamps[-1] if self._sorted_timestamps else None
+        }
+
+    # ------------------------------
+    # Writing (caller holds the exclusive lock)
+    # ------------------------------
+    def append(self, lines, entries):
+        """Append encoded lines (with their entries) and index them"""
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(lines))
+            offset = f.tell() - sum(len(line) for line in lines)
+        index_lines = []
+        for line, entry in zip(lines, entries):
+            index_lines.append(self._index_line(offset, len(line), entry))
+            offset += len(line)
+        self._append_index(index_lines)
+
+    def write_all(self, entries):
+        """Replace the segment and its index with the given entries"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        tmp_index_path = f"{self.index_path}.{os.getpid()}.tmp"
+        offset = 0
+        with open(tmp_path, 'wb') as log_file, open(tmp_index_path, 'wb') as index_file:
+            for entry in entries:
+                line = (json.dumps(entry) + '\n').encode('utf-8')
+                log_file.write(line)
+                index_file.write(self._index_line(offset, len(line), entry))
+                offset += len(line)
+        os.replace(tmp_index_path, self.index_path)
+        os.replace(tmp_path, self.path)
+        self.refresh()
+
+    def close(self):
+        """Compress the segment; returns its manifest record"""
+        self.catch_up()
+        tmp_path = f"{self.gz_path}.{os.getpid()}.tmp"
+        with open(self.path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, self.gz_path)
+        os.remove(self.path)
+        self.refresh()
+        return self.stats()
+
+    def reopen(self):
+        """Decompress a closed segment so entries can be appended to it again"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with gzip.open(self.gz_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, self.path)
+        os.remove(self.gz_path)
+        self.unload()
+
+    def delete(self):
+        for path in (self.path, self.gz_path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.unload()
+
+
+class JsonlLogStore:
+    """
+    Append-only log store partitioned into one segment file per day.
+
+    Entries are appended to the segment of the day they were logged on, one
+    JSON object per line. Once the following day is over too (so late
+    entries still find their segment), a segment is gzip-compressed; an
+    entry arriving even later reopens it and it is compressed again. A
+    segment thus only ever holds its own day's entries. The oldest closed segments are deleted when they pass
+    retention_days or when all segments together, with the search index,
+    take more than retention_bytes.
+
+    Reads only open the segments they need: a run's logs are looked up in
+    the days the run spans, a cursor page starts at the cursor's day, and
+    entry counts of closed segments come from a manifest (segments.jsonl)
+    instead of their indexes. An advisory lock file keeps writers and
+    readers in different worker processes in step.
+
+    A second sidecar (runs.jsonl) holds one summary per run (group_id),
+    updated as the run's entries are appended. version() tells whether
+    anything changed from file metadata alone. Message text is searched
+    through a LogSearchIndex (search.sqlite) updated on every append.
+    """
+
+    def __init__(self, directory, retention_days=30, retention_bytes=2 * 1024 ** 3, legacy_files=()):
+        """
+        Args:
+            directory (str): Directory holding the segment files
+            retention_days (int): Days a closed segment is kept; 0 keeps them
+                regardless of age
+            retention_bytes (int): Disk space all segments and the search
+                index may take before the oldest closed segments are deleted;
+                0 for no limit
+            legacy_files (iterable): logs.jsonl / logs.json files written by
+                earlier versions, migrated the first time the store is used
+        """
+        self.directory = directory
+        self.lock_path = os.path.join(directory, 'logs.lock')
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self.legacy_files = list(legacy_files)
+        self.runs = JsonlRecordFile(os.path.join(directory, 'runs.jsonl'), key='group_id')
+        self.manifest = JsonlRecordFile(os.path.join(directory, 'segments.jsonl'), key='day')
+        self.search_path = os.path.join(directory, 'search.sqlite')
+        self._search_index = None
+        self._lock = threading.Lock()
+        # day -> LogSegment; loaded closed segments are unloaded least recently used first
+        self._segments = {}
+        self._loaded_closed = OrderedDict()
+        self._migrated = False
+        self._runs_checked = False
+        self._retention_checked = False
+
+    # ------------------------------
+    # Segments
+    # ------------------------------
+    def _list_days(self):
+        """Return {day: closed} for every segment on disk, oldest first"""
+        days = {}
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                # A leftover .jsonl next to its .gz means compression did not finish
+                days[match.group(1)] = days.get(match.group(1), True) and match.group(2) is not None
+        return dict(sorted(days.items()))
+
+    def _segment(self, day):
+        segment = self._segments.get(day)
+        if segment is None:
+            segment = self._segments[day] = LogSegment(self.directory, day)
+        return segment
+
+    def _load(self, day):
+        """Return a segment with its index up to date. Caller holds the file lock."""
+        segment = self._segment(day)
+        segment.refresh()
+        if segment.closed:
+            self._loaded_closed[day] = segment
+            self._loaded_closed.move_to_end(day)
+            while len(self._loaded_closed) > MAX_LOADED_SEGMENTS:
+                self._loaded_closed.popitem(last=False)[1].unload()
+        return segment
+
+    def _search(self):
+        """Return the search index, opening it on first use. Caller holds _lock."""
+        if self._search_index is None:
+            self._search_index = LogSearchIndex(self.search_path)
+        return self._search_index
+
+    def _index_for_search(self, day, first_line, entries):
+        """Add appended entries to the search index. Caller holds the exclusive file lock."""
+        try:
+            self._search().add(day, first_line, entries)
+        except sqlite3.Error:
+            # The segment is the record; search catches up with these lines later
+            logger.exception("Error adding %d log entries of %s to the search index", len(entries), day)
+
+    def _read_legacy(self, path):
+        """Return the entries of a logs.jsonl or logs.json file from an earlier version"""
+        try:
+            with open(path, 'r') as f:
+                if not path.endswith('.jsonl'):
+                    logs = json.load(f)
+                    return logs if isinstance(logs, list) else []
+                logs = []
+                for line in f:
+                    try:
+                        logs.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping corrupt log line in %s", path)
+                return logs
+        except json.JSONDecodeError as e:
+            logger.error("JSON decode error when migrating %s: %s", path, e)
+            return []
+
+    def _ensure_migrated(self):
+        """Split logs from earlier versions into day segments. Caller holds _lock."""
+        if self._migrated:
+            return
+        self._migrated = True
+        os.makedirs(self.directory, exist_ok=True)
+        if not any(os.path.exists(path) for path in self.legacy_files):
+            return
+        with file_lock(self.lock_path, exclusive=True):
+            # Another worker may have finished the migration while we waited
+            legacy_files = [path for path in self.legacy_files if os.path.exists(path)]
+            if not legacy_files:
+                return
+            logs = []
+            for path in legacy_files:
+                logs.extend(entry for entry in self._read_legacy(path) if isinstance(entry, dict))
+            logs.sort(key=lambda x: x.get('timestamp', ''))
+            by_day = {}
+            for entry in logs:
+                by_day.setdefault(_entry_day(entry), []).append(entry)
+            for day, entries in by_day.items():
+                self._segment(day).write_all(entries)
+            # Rewritten segments are indexed for search again from scratch
+            self._search().forget(by_day)
+            for path in legacy_files:
+                os.replace(path, path + '.migrated')
+                for sidecar in (path + '.idx', path + '.runs'):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+            self._close_old_segments()
+        logger.info("Migrated %d logs from %s to %s", len(logs), ', '.join(legacy_files), self.directory)
+
+    def _close_old_segments(self):
+        """
+        Compress the segments of days before yesterday (relative to the
+        newest segment). Caller holds the exclusive file lock.
+
+        Returns:
+            bool: Whether any segment was closed
+        """
+        days = self._list_days()
+        if not days:
+            return False
+        keep_from = (date.fromisoformat(list(days)[-1]) - timedelta(days=1)).isoformat()
+        records = []
+        for day, closed in days.items():
+            if not closed and day < keep_from:
+                records.append(self._load(day).close())
+        self.manifest.put_many(records)
+        return bool(records)
+
+    def _enforce_retention(self):
+        """Delete the oldest closed segments past the age or size limit. Caller holds the exclusive file lock."""
+        self._retention_checked = True
+        days = self._list_days()
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat() if self.retention_days else ''
+        segment_bytes = sum(self._segment(day).size() for day in days)
+        search_bytes = self._search().size()
+        # The search index holds every segment's entries, so deleting a
+        # segment is counted as freeing its share of the index too
+        scale = (segment_bytes + search_bytes) / segment_bytes if segment_bytes else 1
+        total_bytes = segment_bytes + search_bytes
+        removed = []
+        freed = 0
+        for day, closed in days.items():
+            over_size = self.retention_bytes and total_bytes > self.retention_bytes
+            if not closed or (day >= cutoff and not over_size):
+                break
+            segment = self._segments.pop(day, None) or LogSegment(self.directory, day)
+            self._loaded_closed.pop(day, None)
+            size = segment.size()
+            segment.delete()
+            total_bytes -= size * scale
+            freed += size
+            removed.append(day)
+        if not removed:
+            return
+
+        self.manifest.delete_many(removed)
+        try:
+            self._search().forget(removed)
+            self._search().compact()
+        except sqlite3.Error:
+            logger.exception("Error removing %d days of logs from the search index", len(removed))
+        # Runs whose logs are all gone drop out of the run list
+        remaining = [day for day in days if day not in removed]
+        oldest = remaining[0] if remaining else date.today().isoformat()
+        stale = [run['group_id'] for run in self.runs.values()
+                 if (run.get('last_timestamp') or '')[:10] < oldest]
+        self.runs.delete_many(stale)
+        logger.info("Log retention removed %d segments (%s to %s, %d bytes) and %d run summaries",
+                    len(removed), removed[0], removed[-1], freed, len(stale))
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def _days_for(self, run, before=None, after=None):
+        """Return {day: closed} (oldest first) for the days that may hold the requested entries. Caller holds the file lock."""
+        first, last = '', '9999'
+        if run and run.get('started_at') and run.get('last_timestamp'):
+            first, last = run['started_at'][:10], run['last_timestamp'][:10]
+        if before is not None:
+            last = min(last, before[0][:10])
+        if after is not None:
+            first = max(first, after[0][:10])
+        return {day: closed for day, closed in self._list_days().items() if first <= day <= last}
+
+    def _segment_lines(self, day, group_id, before, after):
+        """Return a segment and the positions of its matching entries, oldest first. Caller holds the file lock."""
+        segment = self._load(day)
+        lines = segment.lines(group_id)
+        if before is not None and before[0][:10] == day:
+            lines = lines[:bisect_left(lines, segment.cursor_line(before))]
+        if after is not None and after[0][:10] == day:
+            lines = lines[bisect_right(lines, segment.cursor_line(after)):]
+        return segment, lines
+
+    def _closed_counts(self, days):
+        """Entry counts of closed segments, known from the manifest without loading them"""
+        closed = [day for day, is_closed in days.items() if is_closed]
+        if not closed:
+            return {}
+        return {day: record['entries'] for day, record in self.manifest.get_many(closed).items()}
+
+    def count(self, group_id=None):
+        """Return the number of log entries, optionally only those of one group"""
+        run = self.get_run(group_id) if group_id else None
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=False):
+                days = self._days_for(run)
+                if group_id:
+                    return sum(len(self._load(day).lines(group_id)) for day in days)
+                # The first page of logs only needs the total, so open
+                # segments are counted without loading their indexes
+                known = self._closed_counts(days)
+                return sum(known[day] if day in known else self._segment(day).count() for day in days)
+
+    def query(self, group_id=None, offset=0, limit=None, before=None, after=None):
+        """
+        Return log entries newest first.
+
+        Args:
+            group_id (str, optional): Only include logs of this group
+            offset (int): Number of matching entries to skip
+            limit (int, optional): Maximum number of entries to return
+            before (tuple, optional): (timestamp, id) cursor; only return
+                entries older than it
+            after (tuple, optional): (timestamp, id) cursor; only return the
+                entries just newer than it (the oldest ones when limited)
+        """
+        run = self.get_run(group_id) if group_id else None
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=False):
+                days = self._days_for(run, before, after)
+                if after is not None:
+                    return self._query_after(days, group_id, offset, limit, after)
+
+                known = {} if group_id or before is not None else self._closed_counts(days)
+                results = []
+                for day in reversed(list(days)):
+                    if limit is not None and len(results) >= limit:
+                        break
+                    # Skip whole closed segments by their manifest count
+                    if offset >= known.get(day, offset + 1):
+                        offset -= known[day]
+                        continue
+                    segment, lines = self._segment_lines(day, group_id, before, None)
+                    if offset >= len(lines):
+                        offset -= len(lines)
+                        continue
+                    end = len(lines) - offset
+                    offset = 0
+                    start = 0 if limit is None else max(0, end - (limit - len(results)))
+                    results.extend(segment.read_lines(reversed(lines[start:end])))
+                return results
+
+    def tail(self, limit):
+        """
+        Return the newest limit entries, newest first.
+
+        Reads backwards from the end of the newest segments and decodes only
+        the lines returned, without loading any index that isn't loaded yet.
+        """
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=False):
+                results = []
+                for day in reversed(list(self._list_days())):
+                    if len(results) >= limit:
+                        break
+                    results.extend(self._segment(day).tail(limit - len(results)))
+                return results
+
+    def _query_after(self, days, group_id, offset, limit, after):
+        """Return the entries just newer than a cursor, newest first. Caller holds the file lock."""
+        chunks = []
+        found = 0
+        for day in days:
+            if limit is not None and found >= limit:
+                break
+            segment, lines = self._segment_lines(day, group_id, None, after)
+            if offset >= len(lines):
+                offset -= len(lines)
+                continue
+            lines = lines[offset:]
+            offset = 0
+            if limit is not None:
+                lines = lines[:limit - found]
+            chunks.append(segment.read_lines(reversed(lines)))
+            found += len(lines)
+        return [entry for chunk in reversed(chunks) for entry in chunk]
+
+    def _catch_up_search(self):
+        """
+        Add the lines every segment has beyond what the search index covers.
+        Caller holds the shared file lock.
+        """
+        index = self._search()
+        days = self._list_days()
+        counts = self._closed_counts(days)
+        added = 0
+        for day in days:
+            segment = None
+            if day not in counts:
+                segment = self._load(day)
+                counts[day] = len(segment.lines())
+            indexed = index.indexed_lines(day)
+            if indexed == counts[day]:
+                continue
+            if indexed > counts[day]:
+                # The segment was rewritten with fewer lines; index it again
+                index.forget([day])
+                indexed = 0
+            segment = segment or self._load(day)
+            # The search index numbers lines in write order
+            lines = range(indexed, len(segment.lines()))
+            index.add(day, indexed, segment.read_written(lines))
+            added += len(lines)
+        if added:
+            logger.info("Added %d log entries to the search index", added)
+
+    def search(self, query=None, level=None, group_id=None, start=None, end=None, limit=50, offset=0):
+        """
+        Return log entries whose message contains a phrase, newest first.
+
+        Args:
+            query (str, optional): Words to look for, in order; None matches
+                every entry
+            level (str, optional): Only include entries of this level
+            group_id (str, optional): Only include logs of this group
+            start, end (str, optional): Timestamp range, start inclusive and
+                end exclusive
+            limit (int, optional): Maximum number of entries to return
+            offset (int): Number of matching entries to skip
+        """
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=False):
+                self._catch_up_search()
+            return self._search().search(query, level=level, group_id=group_id, start=start, end=end,
+                                         limit=limit, offset=offset)
+
+    def version(self):
+        """
+        Return a string that changes whenever entries or run summaries are
+        written or removed, without reading any log data.
+
+        Open segments and the sidecars only ever grow until they are
+        replaced, so their names, inodes and sizes, together with the names
+        of the compressed segments, change with every write.
+        """
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            names = []
+        parts = []
+        for name in names:
+            if name.endswith('.jsonl'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                parts.append(f"{name}:{stat.st_ino}:{stat.st_size}")
+            elif name.endswith('.jsonl.gz'):
+                parts.append(name)
+        return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+    # ------------------------------
+    # Writing
+    # ------------------------------
+    def append(self, log_entry):
+        """Append one entry to the log"""
+        self.append_many([log_entry])
+
+    def append_many(self, log_entries):
+        """
+        Append entries (oldest first) to the segments of their days. Entries
+        without a timestamp get one here, under the exclusive lock, so they
+        are written in timestamp order.
+        """
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=True):
+                now = datetime.now().isoformat()
+                for entry in log_entries:
+                    entry.setdefault('timestamp', now)
+                days = self._list_days()
+                by_day = {}
+                for entry in log_entries:
+                    lines, entries = by_day.setdefault(_entry_day(entry), ([], []))
+                    lines.append((json.dumps(entry) + '\n').encode('utf-8'))
+                    entries.append(entry)
+                # A segment only holds its own day's entries, which reads
+                # and cursors rely on, so a late entry for a compressed day
+                # reopens that day's segment; it is compressed again below
+                reopened = [day for day in by_day if days.get(day)]
+                if reopened:
+                    for day in reopened:
+                        logger.info("Reopening the log segment of %s for %d late entries", day, len(by_day[day][1]))
+                        self._loaded_closed.pop(day, None)
+                        self._segment(day).reopen()
+                    self.manifest.delete_many(reopened)
+                for day, (lines, entries) in by_day.items():
+                    segment = self._segment(day)
+                    # Index anything another writer left unindexed before our lines
+                    segment.catch_up()
+                    first_line = len(segment.lines())
+                    segment.append(lines, entries)
+                    self._index_for_search(day, first_line, entries)
+                self.runs.update_many(lambda runs: list(apply_entries(runs, log_entries).values()))
+                # Segments only need closing once a new day has started
+                if not self._retention_checked or reopened or any(day not in days for day in by_day):
+                    self._close_old_segments()
+                    self._enforce_retention()
+
+    def clear(self):
+        """Remove every log entry and run summary"""
+        with self._lock:
+            self._migrated = True
+            os.makedirs(self.directory, exist_ok=True)
+            with file_lock(self.lock_path, exclusive=True):
+                for day in self._list_days():
+                    self._segment(day).delete()
+                self._segments = {}
+                self._loaded_closed.clear()
+                self.manifest.replace_all([])
+                self.runs.replace_all([])
+                self._search().clear()
+                self._search().compact()
+
+    # ------------------------------
+    # Run summaries
+    # ------------------------------
+    def _ensure_runs(self):
+        """Build the run summaries from the log the first time they are needed"""
+        if not self._runs_checked:
+            self._runs_checked = True
+            if not self.runs.exists():
+                self.rebuild_runs()
+
+    def get_runs(self, limit=10):
+        """Return the summaries of the latest runs, newest first"""
+        self._ensure_runs()
+        return self.runs.values(newest_first=True, limit=limit)
+
+    def get_run(self, group_id):
+        """Return the summary of one run, or None"""
+        self._ensure_runs()
+        return self.runs.get(group_id)
+
+    def rebuild_runs(self):
+        """
+        Recreate every run summary from the log entries.
+
+        Returns:
+            int: Number of runs found
+        """
+        with self._lock:
+            self._ensure_migrated()
+            with file_lock(self.lock_path, exclusive=True):
+                summaries = {}
+                for day in self._list_days():
+                    segment = self._load(day)
+                    summaries.update(apply_entries(summaries, segment.read_lines(segment.lines())))
+                self.runs.replace_all(sorted(summaries.values(), key=lambda x: x['started_at'] or ''))
+        self._runs_checked = True
+        return len(summaries)
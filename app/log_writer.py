@@ -0,0 +1,231 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from app.log_search import matches, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(entry):
+    """(timestamp, id), the order log pages and cursors use"""
+    return entry.get('timestamp') or '', entry.get('id') or ''
+
+
+class BatchedLogWriter:
+    """
+    Queues log entries in memory and writes them to a store in batches
+    from a single background thread.
+
+    Entries without a timestamp get one when they are queued, under the
+    queue's lock, so the queue (and every batch written from it) is in
+    timestamp order. A batch is written once batch_size entries are waiting
+    or flush_interval seconds have passed. The queue is bounded: when it is full, add_log
+    blocks until the flusher has made room. Entries still in the queue are
+    included in reads, so callers see what they just logged, and are
+    flushed when the interpreter exits.
+
+    The writer has the same log methods as the storage backends
+    (append_log, count_logs, query_logs, tail_logs, search_logs,
+    log_version), so data_manager can use either.
+    """
+
+    def __init__(self, store, max_queue=10000, batch_size=100, flush_interval=0.5):
+        """
+        Args:
+            store: Storage backend with append_logs/count_logs/query_logs/tail_logs
+            max_queue (int): Maximum number of entries waiting to be written
+            batch_size (int): Number of waiting entries that triggers a flush
+            flush_interval (float): Longest time (seconds) an entry waits
+        """
+        self.store = store
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Entries not yet written to the store, oldest first
+        self._pending = deque()
+        self._cond = threading.Condition()
+        # Held while a batch moves from _pending to the store, and by readers,
+        # so an entry is never seen in both places or in neither
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self._flushes = 0
+        # Entries ever queued; part of log_version while they are pending
+        self._entries_queued = 0
+        self._entries_written = 0
+        self._dropped = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        """Start the flusher thread on first use. Caller holds _cond."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._closed,
+                    timeout=self.flush_interval
+                )
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    # ------------------------------
+    # Writing
+    # ------------------------------
+    def append_log(self, log_entry):
+        """Queue a log entry, waiting for room if the queue is full"""
+        with self._cond:
+            if self._closed:
+                # After shutdown there is no flusher left; write directly
+                self.store.append_log(log_entry)
+                return
+            self._ensure_thread()
+            while len(self._pending) >= self.max_queue:
+                self._cond.notify_all()
+                self._cond.wait()
+            # Stamped after waiting for room, so entries are queued in timestamp order
+            log_entry.setdefault('timestamp', datetime.now().isoformat())
+            self._pending.append(log_entry)
+            self._entries_queued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Write every queued entry to the store"""
+        with self._flush_lock:
+            with self._cond:
+                batch = list(self._pending)
+            if not batch:
+                return
+            # Entries queued with their own timestamp may be out of order;
+            # stores keep entries in the order they are appended
+            batch.sort(key=_sort_key)
+
+            started = time.perf_counter()
+            try:
+                self.store.append_logs(batch)
+            except Exception:
+                logger.exception("Error writing %d queued logs", len(batch))
+                self._dropped += len(batch)
+            else:
+                self._entries_written += len(batch)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self._cond:
+                for _ in batch:
+                    self._pending.popleft()
+                self._cond.notify_all()
+
+            self._flushes += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def close(self):
+        """Stop the flusher thread after writing whatever is still queued"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout=10)
+        self.flush()
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def _pending_newest_first(self, group_id):
+        """Return queued entries newest first. Caller holds _flush_lock."""
+        with self._cond:
+            pending = list(self._pending)
+        if group_id:
+            pending = [entry for entry in pending if entry.get('group_id') == group_id]
+        pending.sort(key=_sort_key, reverse=True)
+        return pending
+
+    def count_logs(self, group_id=None):
+        """Return the number of stored plus queued log entries"""
+        with self._flush_lock:
+            return self.store.count_logs(group_id=group_id) + len(self._pending_newest_first(group_id))
+
+    def query_logs(self, group_id=None, offset=0, limit=None, before=None, after=None):
+        """Return log entries newest first, queued entries before stored ones"""
+        with self._flush_lock:
+            pending = self._pending_newest_first(group_id)
+            if before is not None:
+                pending = [entry for entry in pending if (entry['timestamp'], entry['id']) < tuple(before)]
+            if after is not None:
+                # The oldest entries after the cursor are in the store; queued ones fill up the rest
+                pending = [entry for entry in pending if (entry['timestamp'], entry['id']) > tuple(after)]
+                items = self.store.query_logs(group_id=group_id, offset=offset, limit=limit, after=after)
+                room = len(pending) if limit is None else max(0, limit - len(items))
+                return [dict(entry) for entry in pending[len(pending) - room:]] + items
+            end = None if limit is None else offset + limit
+            items = [dict(entry) for entry in pending[offset:end]]
+            if limit is not None and len(items) >= limit:
+                return items
+            store_offset = max(0, offset - len(pending))
+            store_limit = None if limit is None else limit - len(items)
+            return items + self.store.query_logs(group_id=group_id, offset=store_offset, limit=store_limit,
+                                                 before=before)
+
+    def search_logs(self, query=None, level=None, group_id=None, start=None, end=None, limit=50, offset=0):
+        """Return matching log entries newest first, queued entries before stored ones"""
+        tokens = tokenize(query) if query else []
+        if query and not tokens:
+            return []
+        with self._flush_lock:
+            pending = [entry for entry in self._pending_newest_first(None)
+                       if matches(entry, tokens, level=level, group_id=group_id, start=start, end=end)]
+            end_index = None if limit is None else offset + limit
+            items = [dict(entry) for entry in pending[offset:end_index]]
+            if limit is not None and len(items) >= limit:
+                return items
+            return items + self.store.search_logs(query, level=level, group_id=group_id, start=start, end=end,
+                                                  limit=None if limit is None else limit - len(items),
+                                                  offset=max(0, offset - len(pending)))
+
+    def tail_logs(self, limit):
+        """Return the newest log entries, queued entries before stored ones"""
+        with self._flush_lock:
+            items = [dict(entry) for entry in self._pending_newest_first(None)[:limit]]
+            if len(items) < limit:
+                items += self.store.tail_logs(limit - len(items))
+            return items
+
+    def log_version(self):
+        """Return the store's log version, changed by queued entries as well"""
+        with self._flush_lock:
+            return f"{self.store.log_version()}.{self._entries_queued}.{self._dropped}"
+
+    def metrics(self):
+        """Return queue depth and flush statistics"""
+        with self._cond:
+            queue_depth = len(self._pending)
+        return {
+            'queue_depth': queue_depth,
+            'max_queue': self.max_queue,
+            'flushes': self._flushes,
+            'entries_written': self._entries_written,
+            'entries_dropped': self._dropped,
+            'last_flush_ms': round(self._last_flush_ms, 3),
+            'max_flush_ms': round(self._max_flush_ms, 3),
+            'avg_flush_ms': round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+        }
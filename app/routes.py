@@ -1,15 +1,54 @@
 import os
+import csv
 import datetime
+import hashlib
+import io
 import json
+import logging
+import mimetypes
 import re
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, send_from_directory
+import threading
+import time
+import zlib
+from flask import (Blueprint, render_template, redirect, url_for, request, flash, current_app,
+                   send_file, abort, jsonify, Response, stream_with_context)
 from werkzeug.utils import secure_filename
 from app.forms import AccountForm, CityForm, MessageForm, ScheduleForm, SettingsForm
 import app.data_manager as dm
 from app.tasks import start_bot_task
+from app.screenshot_manifest import BLOB_NAME
+from app.thumbnails import THUMBNAIL_WIDTHS
 
 bp = Blueprint('main', __name__)
 
+logger = logging.getLogger(__name__)
+
+# Live log streams: how often a stream checks for entries written by other
+# processes, how often it sends a keep-alive comment, and the most entries
+# it sends in one go
+STREAM_POLL_INTERVAL = 1.0
+STREAM_KEEPALIVE_INTERVAL = 15.0
+STREAM_BATCH_SIZE = 100
+
+# Query parameters of a log search: the phrase, level and date range
+SEARCH_PARAMS = ('q', 'level', 'start', 'end')
+
+# Log exports: entries serialized per chunk of the response, and the CSV columns
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = ('timestamp', 'level', 'group_id', 'message', 'id')
+
+# A screenshot's file never changes once saved and thumbnails are only made
+# again when their screenshot changes, so browsers may keep both for a year
+# without asking again
+SCREENSHOT_MAX_AGE = 365 * 24 * 3600
+
+# Response header that hands a file to the front proxy, per SCREENSHOT_SENDFILE mode
+SENDFILE_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+
+# Number of /logs/stream responses open in this process
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
 # Utility class for pagination
 class Pagination:
     """Simple pagination class similar to Flask-SQLAlchemy's Pagination"""
@@ -20,10 +59,13 @@ class Pagination:
         self.per_page = data['per_page']
         self.total = data['total']
         self.pages = data['pages']
-        self.has_prev = self.page > 1
-        self.has_next = self.page < self.pages
-        self.prev_num = self.page - 1 if self.page > 1 else None
-        self.next_num = self.page + 1 if self.page < self.pages else None
+        # Cursors of the adjacent pages; page is None for pages fetched by cursor
+        self.newer = data.get('newer')
+        self.older = data.get('older')
+        self.has_prev = self.newer is not None
+        self.has_next = self.older is not None
+        self.prev_num = self.page - 1 if self.page and self.page > 1 else None
+        self.next_num = self.page + 1 if self.page and self.page < self.pages else None
     
     def iter_pages(self):
         return range(1, self.pages + 1)
@@ -40,17 +82,14 @@ def dashboard():
     
     # Get the latest logs with proper error handling
     try:
-        logs_data = dm.get_logs(page=1, per_page=5)  # Just get the latest 5 logs
-        print(f"Dashboard: Retrieved logs data with {logs_data.get('total', 0)} total logs")
+        latest_logs = dm.get_latest_logs(5)  # Just get the latest 5 logs
+        logger.debug("Dashboard: retrieved %d latest logs", len(latest_logs))
+        logs_data = {'items': latest_logs, 'page': 1, 'pages': 1, 'total': len(latest_logs), 'per_page': 5}
         
-        if logs_data is None or not isinstance(logs_data, dict) or 'items' not in logs_data:
-            print(f"Dashboard: Invalid logs data structure: {logs_data}")
-            # If logs_data is not properly structured, initialize a default structure
-            logs_data = {'items': [], 'page': 1, 'pages': 0, 'total': 0, 'per_page': 5}
-        elif not logs_data.get('items'):
-            print("Dashboard: No logs found to display")
-    except Exception as e:
-        print(f"Error getting logs for dashboard: {e}")
+        if not latest_logs:
+            logger.debug("Dashboard: no logs found to display")
+    except Exception:
+        logger.exception("Error getting logs for dashboard")
         logs_data = {'items': [], 'page': 1, 'pages': 0, 'total': 0, 'per_page': 5}
         
     settings = dm.get_settings()  # Get application settings
@@ -61,7 +100,7 @@ def dashboard():
             try:
                 account['last_used'] = datetime.datetime.fromisoformat(account['last_used'])
             except (ValueError, TypeError) as e:
-                print(f"Error formatting last_used date for account {account.get('email')}: {e}")
+                logger.warning("Error formatting last_used date for account %s: %s", account.get('email'), e)
                 account['last_used'] = None
     
     for city in cities:
@@ -69,7 +108,7 @@ def dashboard():
             try:
                 city['created_at'] = datetime.datetime.fromisoformat(city['created_at'])
             except (ValueError, TypeError) as e:
-                print(f"Error formatting created_at date for city {city.get('name')}: {e}")
+                logger.warning("Error formatting created_at date for city %s: %s", city.get('name'), e)
                 city['created_at'] = None
     
     scheduled_runs = []
@@ -78,10 +117,16 @@ def dashboard():
         for schedule in schedules:
             if schedule.get('active'):
                 scheduled_runs.append(schedule)
-    except Exception as e:
-        print(f"Error getting schedules: {str(e)}")
+    except Exception:
+        logger.exception("Error getting schedules")
+        
+    try:
+        recent_runs = dm.get_runs(limit=5)
+    except Exception:
+        logger.exception("Error getting bot runs for dashboard")
+        recent_runs = []
         
-    print(f"Rendering dashboard with {len(logs_data.get('items', []))} logs")
+    logger.debug("Rendering dashboard with %d logs", len(logs_data.get('items', [])))
     return render_template('dashboard.html',
                           title='Dashboard',
                           accounts=accounts,
@@ -89,7 +134,8 @@ def dashboard():
                           messages=messages,
                           logs=Pagination(logs_data),
                           settings=settings,
-                          scheduled_runs=scheduled_runs)
+                          scheduled_runs=scheduled_runs,
+                          runs=recent_runs)
 
 @bp.route('/accounts', methods=['GET', 'POST'])
 def accounts():
@@ -237,112 +283,358 @@ def start_bot():
 @bp.route('/logs')
 def logs():
     page = request.args.get('page', 1, type=int)
+    before = request.args.get('before', None)
+    after = request.args.get('after', None)
     group_id = request.args.get('group_id', None)
+    search = {key: request.args.get(key, '').strip() for key in SEARCH_PARAMS}
     
     # Default logs data structure if errors occur
     default_logs = {'items': [], 'page': 1, 'pages': 0, 'total': 0, 'per_page': 50}
     
+    # Searching the messages (within the run when group_id is given)
+    if any(search.values()):
+        try:
+            results = dm.search_logs(search['q'], level=search['level'], group_id=group_id,
+                                     start=search['start'], end=search['end'], page=page, per_page=50)
+        except ValueError:
+            flash('Dates must be given as YYYY-MM-DD', 'warning')
+            results = {'items': [], 'page': 1, 'per_page': 50, 'has_more': False}
+        logs_data = dict(default_logs, items=results['items'], page=results['page'], total=len(results['items']))
+        return render_template('logs.html', logs=Pagination(logs_data), group_id=group_id,
+                               run=dm.get_run(group_id) if group_id else None, search=search,
+                               has_more=results['has_more'], title='Search Logs',
+                               screenshots=_add_screenshot_urls(dm.get_run_screenshots(group_id)) if group_id else [])
+    
     # If specific group_id is provided, show logs for that group only
     if group_id:
         try:
-            logs_data = dm.get_logs(page=page, per_page=50, group_id=group_id)
+            logs_data = dm.get_logs(page=page, per_page=50, group_id=group_id, before=before, after=after)
             
             # Ensure logs_data has the proper structure
             if not isinstance(logs_data, dict) or 'items' not in logs_data:
-                print(f"Invalid logs data structure for group {group_id}: {logs_data}")
+                logger.error("Invalid logs data structure for group %s: %r", group_id, logs_data)
                 logs_data = default_logs
             elif not logs_data.get('items'):
-                print(f"No logs found for group {group_id}")
+                logger.debug("No logs found for group %s", group_id)
             
-            # Check if there are bot start messages to extract account info
-            account_info = {}
-            for log in logs_data.get('items', []):
-                if "Starting bot for account" in log.get('message', ''):
-                    try:
-                        match = re.search(r"Starting bot for account: (\w+)", log.get('message', ''))
-                        if match:
-                            account_id = match.group(1)
-                            account = dm.get_account_by_id(account_id)
-                            if account:
-                                account_info = account
-                                break
-                    except Exception as e:
-                        print(f"Error extracting account info: {e}")
+            run = dm.get_run(group_id)
+            # The run's screenshots come from the manifest's group_id index,
+            # whichever page of its logs is shown
+            screenshots = _add_screenshot_urls(dm.get_run_screenshots(group_id))
             
-            return render_template('logs.html', logs=logs_data, group_id=group_id, 
-                                  account_info=account_info, title='Bot Run Logs')
+            # Follow the run live while it is going and the newest entries are shown
+            stream_after = None
+            live = not logs_data.get('newer') and (run is None or run.get('status') == 'running')
+            if live and logs_data['items']:
+                stream_after = dm.get_log_cursor(logs_data['items'][0])
+            
+            return render_template('logs.html', logs=Pagination(logs_data), group_id=group_id, 
+                                  run=run, live=live, stream_after=stream_after, screenshots=screenshots,
+                                  title='Bot Run Logs')
         except Exception as e:
-            print(f"Error retrieving logs for group {group_id}: {str(e)}")
+            logger.exception("Error retrieving logs for group %s", group_id)
             flash(f"Error retrieving logs: {str(e)}", 'danger')
-            return render_template('logs.html', logs=default_logs, group_id=group_id, title='Bot Run Logs')
+            return render_template('logs.html', logs=Pagination(default_logs), group_id=group_id, title='Bot Run Logs')
     
     # Otherwise show general logs and find unique group_ids for bot runs
     try:
-        logs_data = dm.get_logs(page=page, per_page=50)
+        logs_data = dm.get_logs(page=page, per_page=50, before=before, after=after)
         
         # Ensure logs_data has the proper structure 
         if not isinstance(logs_data, dict) or 'items' not in logs_data:
-            print(f"Invalid logs data structure: {logs_data}")
+            logger.error("Invalid logs data structure: %r", logs_data)
             logs_data = default_logs
         elif not logs_data.get('items'):
-            print("No logs found")
+            logger.debug("No logs found")
         
-        # Find unique group_ids for bot runs (limited to last 10)
+        # Latest bot runs, read from the incrementally maintained run summaries
         bot_runs = []
-        
-        # Check if LOGS_FILE exists first
-        if os.path.exists(dm.LOGS_FILE):
-            try:
-                with open(dm.LOGS_FILE, 'r') as f:
-                    all_logs = json.load(f)
-                    
-                    # Extract unique group_ids with their timestamps
-                    group_data = {}
-                    for log in all_logs:
-                        if log.get('group_id') and "Starting bot" in log.get('message', ''):
-                            group_id = log.get('group_id')
-                            if group_id not in group_data:
-                                timestamp = log.get('timestamp', '')
-                                account_match = re.search(r"Starting bot for account: (\w+)", log.get('message', ''))
-                                account_id = account_match.group(1) if account_match else None
-                                
-                                group_data[group_id] = {
-                                    'timestamp': timestamp,
-                                    'account_id': account_id
-                                }
-                    
-                    # Sort by timestamp (most recent first) and get top 10
-                    sorted_groups = sorted(group_data.items(), 
-                                          key=lambda x: x[1]['timestamp'] if x[1]['timestamp'] else '', 
-                                          reverse=True)
-                    
-                    for group_id, data in sorted_groups[:10]:
-                        account_name = None
-                        if data.get('account_id'):
-                            account = dm.get_account_by_id(data['account_id'])
-                            if account:
-                                account_name = account.get('username', 'Unknown')
-                        
-                        bot_runs.append({
-                            'group_id': group_id,
-                            'timestamp': data['timestamp'],
-                            'account_name': account_name
-                        })
-            except Exception as e:
-                print(f"Error loading bot runs: {e}")
+        try:
+            for run in dm.get_runs(limit=10):
+                bot_runs.append(dict(run, timestamp=run.get('started_at'), account_name=run.get('account')))
+        except Exception:
+            logger.exception("Error loading bot runs")
                 
         # Double check logs_data is correct before passing to template
         if logs_data is None or not isinstance(logs_data, dict) or 'items' not in logs_data:
-            print("Logs data is None or invalid after processing")
+            logger.error("Logs data is None or invalid after processing")
             logs_data = default_logs
         
-        print(f"Rendering logs.html with {len(logs_data.get('items', []))} logs for page {logs_data.get('page', 1)}")
+        logger.debug("Rendering logs.html with %d logs for page %s", len(logs_data.get('items', [])), logs_data.get('page', 1))
         return render_template('logs.html', logs=Pagination(logs_data), bot_runs=bot_runs, title='System Logs')
     except Exception as e:
-        print(f"Error retrieving logs: {str(e)}")
+        logger.exception("Error retrieving logs")
         flash(f"Error retrieving logs: {str(e)}", 'danger')
         return render_template('logs.html', logs=Pagination(default_logs), title='System Logs')
 
+def _sse_event(data, event=None, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+def _release_stream():
+    global _open_streams
+    with _open_streams_lock:
+        _open_streams -= 1
+
+@bp.route('/logs/stream')
+def logs_stream():
+    """
+    Stream the new log entries of a run as Server-Sent Events.
+    
+    Starts after the entry whose cursor is in the Last-Event-ID header (sent
+    by browsers when they reconnect) or the 'after' parameter, or at the
+    run's first entry. Every entry is sent as a message whose id is its
+    cursor. The stream sends an 'end' event and closes once the run has
+    finished, and an 'idle' event (after which the browser reconnects
+    LOG_STREAM_IDLE_RETRY seconds later) when no entry arrived for
+    LOG_STREAM_IDLE_TIMEOUT seconds.
+    """
+    global _open_streams
+    group_id = request.args.get('group_id')
+    if not group_id:
+        return jsonify(error='group_id is required'), 400
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('after')
+    try:
+        items = dm.get_logs_after(group_id, cursor, limit=STREAM_BATCH_SIZE)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    
+    # Every open stream holds a worker thread, so refuse streams over the cap
+    with _open_streams_lock:
+        if _open_streams >= current_app.config['LOG_STREAM_MAX_CLIENTS']:
+            logger.info("Refusing log stream for group %s: %d streams open", group_id, _open_streams)
+            return jsonify(error='Too many live log streams'), 503, {'Retry-After': '30'}
+        _open_streams += 1
+    
+    idle_timeout = current_app.config['LOG_STREAM_IDLE_TIMEOUT']
+    idle_retry = current_app.config['LOG_STREAM_IDLE_RETRY']
+    max_duration = current_app.config['LOG_STREAM_MAX_DURATION']
+    
+    def generate(items, cursor):
+        started = last_entry = last_sent = time.monotonic()
+        # Reconnect after 3 seconds when the connection drops or max_duration closes it
+        yield 'retry: 3000\n\n'
+        while True:
+            for entry in items:
+                cursor = entry.pop('cursor')
+                yield _sse_event(entry, event_id=cursor)
+            now = time.monotonic()
+            if items:
+                last_entry = last_sent = now
+                if len(items) == STREAM_BATCH_SIZE:
+                    items = dm.get_logs_after(group_id, cursor, limit=STREAM_BATCH_SIZE)
+                    continue
+            else:
+                run = dm.get_run(group_id)
+                if run is not None and run.get('status') != 'running':
+                    # Entries written just before the final one are sent before ending
+                    items = dm.get_logs_after(group_id, cursor, limit=STREAM_BATCH_SIZE)
+                    if not items:
+                        yield _sse_event({'status': run['status']}, event='end')
+                        return
+                    continue
+            if now - last_entry >= idle_timeout:
+                # The browser checks again after retry_seconds, without holding a thread meanwhile
+                yield _sse_event({'idle_seconds': round(now - last_entry), 'retry_seconds': idle_retry},
+                                 event='idle')
+                return
+            if now - started >= max_duration:
+                return
+            if now - last_sent >= STREAM_KEEPALIVE_INTERVAL:
+                # Comment line; writing it fails once the client has gone away
+                yield ': keep-alive\n\n'
+                last_sent = now
+            dm.wait_for_logs(STREAM_POLL_INTERVAL)
+            items = dm.get_logs_after(group_id, cursor, limit=STREAM_BATCH_SIZE)
+    
+    response = Response(stream_with_context(generate(items, cursor)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(_release_stream)
+    return response
+
+def _api_response(build):
+    """
+    Return the JSON from build() with a strong ETag made of the log version
+    and the request's path and query string.
+    
+    A request whose If-None-Match still matches gets 304 without build()
+    being called, so an unchanged poll loads no log data.
+    """
+    query = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    digest = hashlib.blake2b(f"{request.path}?{query}".encode('utf-8'), digest_size=6).hexdigest()
+    etag = f"{dm.get_log_version()}-{digest}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(json.dumps(build(), separators=(',', ':')), mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the response but must revalidate it before every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/api/logs')
+def api_logs():
+    """
+    Log entries as JSON, newest first.
+    
+    Query parameters: group_id, limit (1-200, default 50), and either page
+    or a before/after cursor taken from a previous response's 'older' and
+    'newer'. With q (a phrase to search the messages for), level, start or
+    end (ISO dates or datetimes) the entries are searched instead, paged by
+    page only, and the response has 'has_more' instead of cursors and
+    totals.
+    """
+    group_id = request.args.get('group_id') or None
+    before = request.args.get('before') or None
+    after = request.args.get('after') or None
+    page = request.args.get('page', 1, type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    for cursor in (before, after):
+        if cursor and not dm.is_log_cursor(cursor):
+            return jsonify(error=f"Invalid cursor: {cursor}"), 400
+    search = {key: request.args.get(key) or None for key in SEARCH_PARAMS}
+    if any(search.values()):
+        try:
+            for key in ('start', 'end'):
+                if search[key]:
+                    datetime.datetime.fromisoformat(search[key])
+        except ValueError:
+            return jsonify(error='start and end must be ISO dates or datetimes'), 400
+        
+        def build():
+            return dm.search_logs(search['q'], level=search['level'], group_id=group_id, start=search['start'],
+                                  end=search['end'], page=page, per_page=limit)
+        
+        return _api_response(build)
+    
+    def build():
+        logs_data = dm.get_logs(page=page, per_page=limit, group_id=group_id, before=before, after=after)
+        return {
+            'items': logs_data['items'],
+            'total': logs_data['total'],
+            'page': logs_data['page'],
+            'pages': logs_data['pages'],
+            'newer': logs_data['newer'],
+            'older': logs_data['older']
+        }
+    
+    return _api_response(build)
+
+@bp.route('/api/runs')
+def api_runs():
+    """
+    Summaries of the latest bot runs as JSON, newest first.
+    
+    Query parameters: limit (1-100, default 10) and status (running,
+    completed or failed).
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    status = request.args.get('status') or None
+    
+    def build():
+        if status is None:
+            runs = dm.get_runs(limit=limit)
+        else:
+            runs = [run for run in dm.get_runs(limit=None) if run.get('status') == status][:limit]
+        return {'items': runs}
+    
+    return _api_response(build)
+
+def _batched(iterable, size):
+    """Yield lists of up to size items"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _export_jsonl(entries):
+    """Yield entries as JSON lines, one chunk per EXPORT_BATCH_SIZE entries"""
+    for batch in _batched(entries, EXPORT_BATCH_SIZE):
+        yield ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch)
+
+def _export_csv(entries):
+    """Yield entries as CSV with a header row, one chunk per EXPORT_BATCH_SIZE entries"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for batch in _batched(entries, EXPORT_BATCH_SIZE):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _gzip_chunks(chunks):
+    """Compress text chunks into a gzip stream as they are produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Export format -> (mimetype, serializer)
+EXPORT_FORMATS = {
+    'jsonl': ('application/x-ndjson', _export_jsonl),
+    'csv': ('text/csv', _export_csv),
+}
+
+@bp.route('/logs/export')
+def export_logs():
+    """
+    Download log entries as JSON lines or CSV, oldest first.
+
+    Query parameters: format (jsonl or csv, default jsonl), gzip (1 to
+    compress the file), group_id, and start/end (ISO dates or datetimes;
+    end is exclusive, and a date-only end includes that day). The file is
+    generated while it is sent, so memory use does not depend on its size.
+    """
+    export_format = request.args.get('format', 'jsonl').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(error='format must be jsonl or csv'), 400
+    group_id = request.args.get('group_id') or None
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        entries = dm.export_logs(group_id=group_id, start=request.args.get('start') or None,
+                                 end=request.args.get('end') or None)
+    except ValueError:
+        return jsonify(error='start and end must be ISO dates or datetimes'), 400
+
+    mimetype, serialize = EXPORT_FORMATS[export_format]
+    chunks = serialize(entries)
+    filename = f"logs-{secure_filename(group_id) if group_id else 'all'}.{export_format}"
+    if compress:
+        chunks = _gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Send chunks as they are generated instead of buffering the whole file in nginx
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/metrics/log-writer')
+def log_writer_metrics():
+    return jsonify(dm.get_log_writer_metrics())
+
+@bp.route('/metrics/screenshot-sink')
+def screenshot_sink_metrics():
+    return jsonify(dm.get_screenshot_sink_metrics())
+
 @bp.route('/settings', methods=['GET', 'POST'])
 def settings():
     current_settings = dm.get_settings()
@@ -402,41 +694,89 @@ def delete_schedule(schedule_id):
 
 @bp.route('/screenshots')
 def screenshots():
-    # Get all PNG files from the screenshots directory
-    screenshots_dir = os.path.join(current_app.root_path, '..', 'screenshots')
-    os.makedirs(screenshots_dir, exist_ok=True)  # Ensure directory exists
-    
-    screenshots = []
-    
-    if os.path.exists(screenshots_dir):
-        # Get all PNG files with creation time
-        for filename in os.listdir(screenshots_dir):
-            if filename.lower().endswith('.png'):
-                filepath = os.path.join('/screenshot', filename)
-                created_at = datetime.datetime.fromtimestamp(
-                    os.path.getctime(os.path.join(screenshots_dir, filename))
-                )
-                
-                # Try to extract a descriptive name
-                name_parts = filename.split('_')
-                if len(name_parts) > 0:
-                    description = name_parts[0].replace('_', ' ').title()
-                else:
-                    description = "Screenshot"
-                    
-                screenshots.append({
-                    'filename': filename,
-                    'filepath': filepath,
-                    'created_at': created_at,
-                    'description': description
-                })
-        
-        # Sort screenshots by creation time (newest first)
-        screenshots.sort(key=lambda x: x['created_at'], reverse=True)
+    page = request.args.get('page', 1, type=int)
+    # Read one page from the screenshot manifest, newest first
+    screenshots_data = dm.get_screenshots(page=page, per_page=24)
+    _add_screenshot_urls(screenshots_data['items'])
     
-    return render_template('screenshots.html', screenshots=screenshots)
+    return render_template('screenshots.html', screenshots=Pagination(screenshots_data))
+
+def _add_screenshot_urls(screenshots):
+    """Add the image and thumbnail URLs, time and description the templates show to manifest records"""
+    for screenshot in screenshots:
+        screenshot['filepath'] = url_for('main.get_screenshot', filename=screenshot['filename'])
+        screenshot['thumbnails'] = {width: url_for('main.get_screenshot_thumbnail', filename=screenshot['filename'],
+                                                   width=width) for width in THUMBNAIL_WIDTHS}
+        screenshot['created_at'] = datetime.datetime.fromisoformat(screenshot['timestamp'])
+        screenshot['description'] = screenshot['prefix'].replace('_', ' ').title()
+    return screenshots
 
 @bp.route('/screenshot/<filename>')
 def get_screenshot(filename):
-    screenshots_dir = os.path.join(current_app.root_path, '..', 'screenshots')
-    return send_from_directory(screenshots_dir, filename) 
\ No newline at end of file
+    # Identical screenshots share one content-addressed file
+    stored = dm.resolve_screenshot(filename)
+    if stored is None:
+        abort(404)
+    # Content-addressed files are their own strong ETag
+    etag = stored.split('.')[0] if BLOB_NAME.match(stored) else True
+    return _send_screenshot_file(os.path.join(dm.get_screenshots_dir(), stored), etag=etag,
+                                 download_name=filename)
+
+@bp.route('/screenshot/<filename>/thumbnail/<int:width>')
+def get_screenshot_thumbnail(filename, width):
+    try:
+        path = dm.get_screenshot_thumbnail(filename, width)
+    except ValueError:
+        path = None
+    except OSError:
+        # Not an image Pillow can read (or it was deleted meanwhile)
+        logger.warning("Could not make a thumbnail of %s", filename, exc_info=True)
+        path = None
+    if path is None:
+        abort(404)
+    source = os.path.basename(path)[:-len(f".{width}.jpg")]
+    etag = f"{source.split('.')[0]}-{width}" if BLOB_NAME.match(source) else True
+    return _send_screenshot_file(path, mimetype='image/jpeg', etag=etag)
+
+def _send_screenshot_file(path, mimetype=None, etag=True, download_name=None):
+    """
+    Send a screenshot or thumbnail as an immutable resource: public, fresh
+    for SCREENSHOT_MAX_AGE, with a strong ETag (etag, or one made from the
+    file's time and size if True) and answering Range requests.
+    
+    With SCREENSHOT_SENDFILE set, the response only names the file and the
+    front proxy sends it, so no worker thread streams the bytes; conditional
+    requests are still answered here. Files outside the screenshots
+    directory are always sent by the app in x-accel-redirect mode.
+    """
+    mode = current_app.config['SCREENSHOT_SENDFILE']
+    location = None
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(path, dm.get_screenshots_dir())
+        if not relative.startswith(os.pardir):
+            prefix = current_app.config['SCREENSHOT_ACCEL_PREFIX'].rstrip('/')
+            location = f"{prefix}/{relative.replace(os.sep, '/')}"
+    elif mode == 'x-sendfile':
+        location = os.path.abspath(path)
+    
+    if location is None:
+        response = send_file(path, mimetype=mimetype, etag=etag, download_name=download_name,
+                             conditional=True, max_age=SCREENSHOT_MAX_AGE)
+    else:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            abort(404)
+        mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers[SENDFILE_HEADERS[mode]] = location
+        if download_name:
+            response.headers.set('Content-Disposition', 'inline', filename=download_name)
+        response.last_modified = stat.st_mtime
+        response.set_etag(etag if isinstance(etag, str) else f"{stat.st_mtime}-{stat.st_size}")
+        # The proxy serves byte ranges itself
+        response.make_conditional(request)
+    response.cache_control.public = True
+    response.cache_control.max_age = SCREENSHOT_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,71 @@
+import re
+
+# First log line of a run, written by app.tasks.start_bot_task
+START_PATTERN = re.compile(r"Starting bot for (\S+) in (.+)")
+
+
+def new_summary(group_id):
+    """Return an empty summary for a run"""
+    return {
+        'group_id': group_id,
+        'started_at': None,
+        'last_timestamp': None,
+        'account': None,
+        'city': None,
+        'last_level': None,
+        'entry_count': 0,
+        'error_count': 0,
+        'status': 'running'
+    }
+
+
+def apply_entry(summary, entry):
+    """
+    Update a run summary with one of the run's log entries.
+
+    The status stays 'running' until the run logs its final 'success'
+    entry (then 'completed', or 'failed' if it logged errors) or a
+    "Bot error" from the task wrapper ('failed').
+    """
+    message = entry.get('message') or ''
+    level = entry.get('level')
+    timestamp = entry.get('timestamp')
+
+    if summary['started_at'] is None or (timestamp and timestamp < summary['started_at']):
+        summary['started_at'] = timestamp
+    if summary['last_timestamp'] is None or (timestamp and timestamp >= summary['last_timestamp']):
+        summary['last_timestamp'] = timestamp
+        summary['last_level'] = level
+
+    if summary['account'] is None:
+        match = START_PATTERN.match(message)
+        if match:
+            summary['account'], summary['city'] = match.group(1), match.group(2)
+
+    summary['entry_count'] += 1
+    if level == 'error':
+        summary['error_count'] += 1
+        if message.startswith('Bot error:'):
+            summary['status'] = 'failed'
+    elif level == 'success':
+        summary['status'] = 'failed' if summary['error_count'] else 'completed'
+    return summary
+
+
+def apply_entries(summaries, entries):
+    """
+    Apply log entries (oldest first) to a dict of summaries keyed by group_id.
+
+    Returns:
+        dict: The summaries that changed, keyed by group_id
+    """
+    changed = {}
+    for entry in entries:
+        group_id = entry.get('group_id')
+        if not group_id:
+            continue
+        if group_id not in changed:
+            existing = summaries.get(group_id)
+            changed[group_id] = dict(existing) if existing else new_summary(group_id)
+        apply_entry(changed[group_id], entry)
+    return changed
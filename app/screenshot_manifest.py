@@ -0,0 +1,248 @@
+import hashlib
+import os
+import re
+from datetime import datetime
+
+from app.jsonl_records import JsonlRecordFile
+
+# Screenshots are named <prefix>_<unix time>-<milliseconds>.<ext> by save_screenshot
+# (without the milliseconds before they were added)
+SCREENSHOT_NAME = re.compile(r'^(?P<prefix>.+)_(?P<time>\d+)(?:-(?P<millis>\d{3}))?\.(?:png|jpe?g|webp)$',
+                             re.IGNORECASE)
+# and stored once per distinct image as <sha256>.<ext>
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}\.(?:png|jpe?g|webp)$')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def parse_filename(filename):
+    """Return (prefix, datetime) from a screenshot's file name, or (None, None) if it has another form"""
+    match = SCREENSHOT_NAME.match(filename)
+    if not match:
+        return None, None
+    try:
+        taken_at = datetime.fromtimestamp(int(match.group('time')) + int(match.group('millis') or 0) / 1000)
+    except (OverflowError, OSError, ValueError):
+        return match.group('prefix'), None
+    return match.group('prefix'), taken_at
+
+
+def stored_name(record):
+    """Return the name of the file in the directory that holds a record's image"""
+    return record.get('blob') or record['filename']
+
+
+def content_hash(data):
+    """Return the hash blobs are named by"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ScreenshotManifest:
+    """
+    Index of the screenshots in a directory, kept in manifest.jsonl next to
+    them.
+
+    Every saved screenshot is recorded with its filename, prefix, timestamp,
+    group_id and size, so the gallery pages through the manifest instead of
+    listing and stat-ing the directory. Records are in the order they were
+    taken, and indexed by group_id so a run's screenshots are found without
+    a scan. rescan() rebuilds the manifest from the files on disk.
+
+    Identical screenshots are stored once: the image is a blob named by its
+    content hash (<sha256>.<ext>) and each screenshot's record names it in
+    'blob', so the screenshot's own file name is just a key in the manifest.
+    A blob is deleted with the last record that uses it. Records without a
+    blob (saved before blobs, or copied in by hand) are files of their own
+    name until rescan() moves them into blobs.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # The lock file lives in the directory, so it must exist before any read
+        os.makedirs(directory, exist_ok=True)
+        self.records = JsonlRecordFile(os.path.join(directory, 'manifest.jsonl'), key='filename',
+                                       index=('group_id',))
+
+    def _record_for(self, filename, group_id=None, prefix=None, blob=None):
+        """Return a manifest record for a file in the directory, or None if it is gone"""
+        try:
+            stat = os.stat(os.path.join(self.directory, blob or filename))
+        except FileNotFoundError:
+            return None
+        parsed_prefix, taken_at = parse_filename(filename)
+        prefix = prefix or parsed_prefix or os.path.splitext(filename)[0]
+        if taken_at is None:
+            taken_at = datetime.fromtimestamp(stat.st_mtime)
+        record = {
+            'filename': filename,
+            'prefix': prefix,
+            'timestamp': taken_at.isoformat(),
+            'group_id': group_id,
+            'size': stat.st_size
+        }
+        if blob:
+            record['blob'] = blob
+        return record
+
+    def add(self, filename, group_id=None, prefix=None, blob=None):
+        """
+        Record a screenshot that was just saved; returns the record, or None
+        if its file is missing.
+
+        Args:
+            blob (str, optional): Blob holding the image; the file is
+                filename itself when not given
+        """
+        record = self._record_for(filename, group_id, prefix, blob)
+        if record is not None:
+            self.records.put_many([record])
+        return record
+
+    def resolve(self, filename):
+        """
+        Return the name of the file in the directory holding a screenshot,
+        or None if there is no such screenshot.
+
+        Screenshots that are not recorded resolve to the file of that name.
+        """
+        if os.path.basename(filename) != filename or filename.startswith('.'):
+            return None
+        record = self.records.get(filename)
+        if record is not None:
+            return stored_name(record)
+        if filename.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(self.directory, filename)):
+            return filename
+        return None
+
+    def page(self, page=1, per_page=24):
+        """Return (records newest first, total) for one page"""
+        total = self.records.count()
+        return self.records.values(newest_first=True, offset=(page - 1) * per_page, limit=per_page), total
+
+    def count(self):
+        return self.records.count()
+
+    def for_group(self, group_id):
+        """Return the screenshots of a bot run, in the order they were recorded"""
+        return self.records.find('group_id', group_id)
+
+    def all(self):
+        """Return every record, oldest first"""
+        return self.records.values()
+
+    def _delete_file(self, name):
+        """Delete a file in the directory; returns its size, or 0 if it was already gone"""
+        path = os.path.join(self.directory, name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def remove(self, filenames):
+        """
+        Delete screenshots' records, and the files no remaining record uses.
+
+        Returns:
+            tuple: (bytes freed on disk, names of the files deleted)
+        """
+        filenames = set(filenames)
+        deleted = []
+        freed = 0
+
+        def rebuild(current):
+            nonlocal freed
+            kept = [record for name, record in current.items() if name not in filenames]
+            in_use = {stored_name(record) for record in kept}
+            unused = {stored_name(current[name]) for name in filenames if name in current} - in_use
+            # Deleted under the manifest lock, so a screenshot recorded
+            # meanwhile cannot start using a blob that is about to go
+            for name in sorted(unused):
+                freed += self._delete_file(name)
+                deleted.append(name)
+            return kept
+
+        if filenames:
+            self.records.rewrite(rebuild)
+        return freed, deleted
+
+    def _move_to_blob(self, filename):
+        """Move a file of its own name into the blob of its content; returns the blob's name"""
+        path = os.path.join(self.directory, filename)
+        with open(path, 'rb') as f:
+            digest = content_hash(f.read())
+        blob = f"{digest}{os.path.splitext(filename)[1].lower()}"
+        blob_path = os.path.join(self.directory, blob)
+        if os.path.exists(blob_path):
+            os.remove(path)
+        else:
+            os.replace(path, blob_path)
+        return blob
+
+    def rescan(self, find_group_id=None):
+        """
+        Rebuild the manifest from the image files in the directory.
+
+        Image files that are not blobs are moved into blobs, keeping their
+        name in the manifest. Files that are already recorded keep their
+        group_id; for the others find_group_id(filename) is asked, if given.
+        Blobs no record uses are recorded under their own name. Screenshots
+        recorded while the directory is scanned are kept.
+
+        Returns:
+            tuple: (number of screenshots, number of files that were not
+            recorded, number of records whose file was gone, names of the
+            files moved into blobs)
+        """
+        names = [name for name in os.listdir(self.directory) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        known = {record['filename']: record for record in self.records.values()}
+        scanned = []
+        moved = []
+        added = 0
+        for name in names:
+            if BLOB_NAME.match(name):
+                continue
+            if name in known:
+                group_id, prefix = known[name].get('group_id'), known[name].get('prefix')
+            else:
+                group_id, prefix = find_group_id(name) if find_group_id else None, None
+            # Read the time from the file before it becomes a blob, which
+            # may be an older copy
+            record = self._record_for(name, group_id, prefix)
+            if record is None:
+                continue
+            record['blob'] = self._move_to_blob(name)
+            added += name not in known
+            moved.append(name)
+            scanned.append(record)
+        scanned_names = {record['filename'] for record in scanned}
+        for name, record in known.items():
+            if name in scanned_names or not record.get('blob'):
+                continue
+            record = self._record_for(name, record.get('group_id'), record.get('prefix'), record['blob'])
+            if record is not None:
+                scanned.append(record)
+                scanned_names.add(name)
+        in_use = {stored_name(record) for record in scanned}
+        for name in names:
+            if BLOB_NAME.match(name) and name not in in_use and name not in scanned_names:
+                record = self._record_for(name, blob=name)
+                if record is not None:
+                    scanned.append(record)
+                    scanned_names.add(name)
+                    added += 1
+        counts = {}
+
+        def rebuild(current):
+            # Keep records added since the scan started if their file exists
+            recent = [dict(record) for name, record in current.items()
+                      if name not in scanned_names and name not in known
+                      and os.path.exists(os.path.join(self.directory, stored_name(record)))]
+            counts['missing'] = sum(1 for name in known if name not in scanned_names)
+            records = scanned + recent
+            records.sort(key=lambda record: (record['timestamp'], record['filename']))
+            counts['total'] = len(records)
+            return records
+
+        self.records.rewrite(rebuild)
+        return counts['total'], added, counts['missing'], moved
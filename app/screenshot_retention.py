@@ -0,0 +1,88 @@
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from app.screenshot_manifest import stored_name
+
+logger = logging.getLogger(__name__)
+
+
+def select_expired(records, now, max_age_days=0, max_count=0, max_bytes=0, failed_groups=(),
+                   failed_max_age_days=0):
+    """
+    Return the screenshot records to delete under a retention policy.
+
+    Screenshots older than max_age_days go first (failed_max_age_days for
+    those of failed runs). If the rest still number more than max_count or
+    take more than max_bytes, the oldest of them go too, failed runs'
+    screenshots last. A limit of 0 turns it off. Screenshots sharing a blob
+    count its size once, and free it only when the last of them goes.
+
+    Args:
+        records (list): Manifest records, oldest first
+        now (datetime): Current time, naive local like the record timestamps
+        failed_groups (set): group_ids of failed runs
+
+    Returns:
+        list: Records to delete, oldest first within each policy
+    """
+    def cutoff(days):
+        return (now - timedelta(days=days)).isoformat() if days else ''
+
+    cutoffs = {False: cutoff(max_age_days), True: cutoff(failed_max_age_days)}
+    expired, kept = [], []
+    for record in records:
+        failed = record.get('group_id') in failed_groups
+        (expired if record['timestamp'] < cutoffs[failed] else kept).append(record)
+
+    count = len(kept)
+    references = Counter(stored_name(record) for record in kept)
+    total_bytes = stored_bytes(kept)
+    by_priority = ([record for record in kept if record.get('group_id') not in failed_groups] +
+                   [record for record in kept if record.get('group_id') in failed_groups])
+    for record in by_priority:
+        if not ((max_count and count > max_count) or (max_bytes and total_bytes > max_bytes)):
+            break
+        expired.append(record)
+        count -= 1
+        references[stored_name(record)] -= 1
+        if not references[stored_name(record)]:
+            total_bytes -= record.get('size') or 0
+    return expired
+
+
+def stored_bytes(records):
+    """Return the bytes the records' files take on disk, counting each shared blob once"""
+    return sum({stored_name(record): record.get('size') or 0 for record in records}.values())
+
+
+class ScreenshotSweeper:
+    """
+    Daemon thread that calls sweep() shortly after it starts and then every
+    interval seconds. Errors are logged and the next sweep runs as planned.
+    """
+
+    def __init__(self, sweep, interval, first_delay=60):
+        self.sweep = sweep
+        self.interval = interval
+        self.first_delay = first_delay
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='screenshot-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        delay = self.first_delay
+        while not self._stop.wait(delay):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Screenshot sweep failed")
+            delay = self.interval
@@ -0,0 +1,219 @@
+import atexit
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# File extension of each encoding
+EXTENSIONS = {'webp': 'webp', 'png': 'png'}
+# Times a screenshot is recorded before giving up when its blob keeps
+# being deleted by retention first
+RECORD_ATTEMPTS = 3
+
+
+class ScreenshotSink:
+    """
+    Encodes screenshots and writes them to disk from a single background
+    thread.
+
+    save() takes the PNG bytes a browser returns, picks the file name and
+    returns it at once. The worker stores each distinct image once, as a
+    blob named by the SHA-256 of the PNG (<sha256>.<ext>): if the blob is
+    not there yet, it re-encodes the image with Pillow (lossy WebP, or
+    optimised PNG), writes it under a temporary name and renames it into
+    place, so readers never see a partial file. It then calls
+    on_saved(filename, blob, size, **context) to record the file name as a
+    reference to the blob; if on_saved returns False because the blob was
+    gone by then (retention deletes blobs no record uses), the blob is
+    written again and on_saved called again. The queue is bounded: when it is full, save()
+    waits for the worker to make room. Queued screenshots are written when
+    the interpreter exits.
+    """
+
+    def __init__(self, directory, on_saved=None, image_format='webp', quality=80, max_queue=16):
+        """
+        Args:
+            directory (str): Directory the screenshots are written to
+            on_saved: Called from the worker as on_saved(filename, blob,
+                size, **context) once a screenshot's blob is on disk;
+                returns False if the blob was missing when it came to
+                record it
+            image_format (str): 'webp' (lossy, at quality) or 'png'
+                (optimised, lossless)
+            quality (int): WebP quality, 1-100
+            max_queue (int): Screenshots waiting to be encoded before save()
+                blocks (each holds a few MB of PNG data)
+        """
+        if image_format not in EXTENSIONS:
+            raise ValueError(f"Unknown screenshot format: {image_format!r}")
+        self.directory = directory
+        self.on_saved = on_saved
+        self.image_format = image_format
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        # prefix -> milliseconds of the last file name given out under it
+        self._last_names = {}
+        self._thread = None
+        self._closed = False
+
+        self._saved = 0
+        self._deduplicated = 0
+        self._failed = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._total_encode_ms = 0.0
+
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        """Start the worker thread on first use. Caller holds _lock."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='screenshot-sink', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            finally:
+                self._queue.task_done()
+
+    def filename(self, prefix, timestamp=None):
+        """
+        Return the file name a screenshot saved now under prefix gets:
+        <prefix>_<unix seconds>-<milliseconds>.<ext>. Names are unique per
+        prefix, a millisecond later than the last one if need be, as they
+        are the manifest's keys.
+        """
+        millis = int((time.time() if timestamp is None else timestamp) * 1000)
+        with self._lock:
+            millis = max(millis, self._last_names.get(prefix, -1) + 1)
+            self._last_names[prefix] = millis
+        return f"{prefix}_{millis // 1000}-{millis % 1000:03d}.{EXTENSIONS[self.image_format]}"
+
+    def save(self, png, prefix, **context):
+        """
+        Queue a screenshot to be encoded and written.
+
+        Args:
+            png (bytes): PNG data, e.g. from driver.get_screenshot_as_png()
+            prefix (str): What the screenshot shows, e.g. 'login_page'
+            context: Passed on to on_saved (e.g. group_id)
+
+        Returns:
+            str: The screenshot's file name (a key of the manifest, not a
+            file in directory)
+        """
+        filename = self.filename(prefix)
+        with self._lock:
+            if self._closed:
+                # After shutdown there is no worker left; write directly
+                self._write(filename, png, prefix, context)
+                return filename
+            self._ensure_thread()
+        self._queue.put((filename, png, prefix, context))
+        return filename
+
+    def _encode(self, png):
+        """Return png re-encoded in image_format"""
+        from PIL import Image
+
+        with Image.open(io.BytesIO(png)) as image:
+            # Browser screenshots are opaque; dropping alpha saves space
+            image = image.convert('RGB')
+            output = io.BytesIO()
+            if self.image_format == 'webp':
+                image.save(output, 'WEBP', quality=self.quality, method=4)
+            else:
+                image.save(output, 'PNG', optimize=True)
+            return output.getvalue()
+
+    def _store(self, path, png):
+        """Encode png and write it to path atomically; returns the encoded size"""
+        started = time.perf_counter()
+        data = self._encode(png)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._bytes_out += len(data)
+        self._total_encode_ms += elapsed_ms
+        return len(data)
+
+    def _write(self, filename, png, prefix, context):
+        # Pixel-identical captures give identical PNGs, so hashing the PNG
+        # finds a duplicate before paying for the encode
+        blob = f"{hashlib.sha256(png).hexdigest()}.{EXTENSIONS[self.image_format]}"
+        path = os.path.join(self.directory, blob)
+        try:
+            try:
+                size = os.path.getsize(path)
+                self._deduplicated += 1
+            except FileNotFoundError:
+                size = self._store(path, png)
+        except Exception:
+            logger.exception("Error saving screenshot %s", filename)
+            self._failed += 1
+            return
+        self._saved += 1
+        self._bytes_in += len(png)
+        if self.on_saved is not None:
+            try:
+                for attempt in range(RECORD_ATTEMPTS):
+                    if attempt:
+                        # Retention deleted the blob before the screenshot
+                        # was recorded; write it back and record it again
+                        size = self._store(path, png)
+                    if self.on_saved(filename, blob, size, prefix=prefix, **context) is not False:
+                        break
+                else:
+                    logger.error("Screenshot %s was not recorded: its file kept being deleted", filename)
+            except Exception:
+                logger.exception("Error recording screenshot %s", filename)
+
+    def flush(self):
+        """Wait until every queued screenshot is written"""
+        self._queue.join()
+
+    def close(self):
+        """Stop the worker after writing whatever is still queued"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=30)
+        # Screenshots queued while closing, after the worker stopped
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                self._write(*job)
+
+    def metrics(self):
+        """Return counts, queue depth and average encoding time"""
+        encoded = self._saved - self._deduplicated
+        return {
+            'queue_depth': self._queue.qsize(),
+            'saved': self._saved,
+            'deduplicated': self._deduplicated,
+            'failed': self._failed,
+            'bytes_in': self._bytes_in,
+            'bytes_out': self._bytes_out,
+            'avg_encode_ms': round(self._total_encode_ms / encoded, 1) if encoded > 0 else 0.0
+        }
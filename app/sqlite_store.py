@@ -0,0 +1,461 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from app.log_search import phrase_query, search_filter
+from app.run_summaries import apply_entries
+
+logger = logging.getLogger(__name__)
+
+# Columns of each collection table, in the order records are returned
+COLLECTION_COLUMNS = {
+    'accounts': ('id', 'email', 'password', 'active', 'last_used', 'created_at'),
+    'cities': ('id', 'name', 'radius', 'created_at'),
+    'messages': ('id', 'content', 'image', 'created_at', 'last_used'),
+    'schedules': ('id', 'start_time', 'end_time', 'active', 'created_at'),
+}
+LOG_COLUMNS = ('id', 'message', 'level', 'timestamp', 'group_id')
+RUN_COLUMNS = ('group_id', 'started_at', 'last_timestamp', 'account', 'city', 'last_level',
+               'entry_count', 'error_count', 'status')
+
+# Columns stored as INTEGER but exposed as booleans
+BOOLEAN_COLUMNS = {'active'}
+
+# Seconds between log retention checks in one process
+RETENTION_CHECK_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    password TEXT,
+    active INTEGER,
+    last_used TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS cities (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    radius INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    content TEXT,
+    image TEXT,
+    created_at TEXT,
+    last_used TEXT
+);
+CREATE TABLE IF NOT EXISTS schedules (
+    id TEXT PRIMARY KEY,
+    start_time TEXT,
+    end_time TEXT,
+    active INTEGER,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS logs (
+    id TEXT PRIMARY KEY,
+    message TEXT,
+    level TEXT,
+    timestamp TEXT,
+    group_id TEXT
+);
+-- (timestamp, id) is the sort key of log pages and their cursors
+DROP INDEX IF EXISTS idx_logs_timestamp;
+DROP INDEX IF EXISTS idx_logs_group_id;
+CREATE INDEX IF NOT EXISTS idx_logs_timestamp_id ON logs (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_logs_group_timestamp_id ON logs (group_id, timestamp, id);
+-- Searches by level without a text query
+CREATE INDEX IF NOT EXISTS idx_logs_level_timestamp_id ON logs (level, timestamp, id);
+CREATE TABLE IF NOT EXISTS runs (
+    group_id TEXT PRIMARY KEY,
+    started_at TEXT,
+    last_timestamp TEXT,
+    account TEXT,
+    city TEXT,
+    last_level TEXT,
+    entry_count INTEGER,
+    error_count INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs (started_at);
+-- Full-text index of log messages, kept in step with logs by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(message, content='logs', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS logs_fts_ai AFTER INSERT ON logs BEGIN
+    INSERT INTO logs_fts (rowid, message) VALUES (new.rowid, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_fts_ad AFTER DELETE ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, message) VALUES ('delete', old.rowid, old.message);
+END;
+CREATE TRIGGER IF NOT EXISTS logs_fts_au AFTER UPDATE OF message ON logs BEGIN
+    INSERT INTO logs_fts (logs_fts, rowid, message) VALUES ('delete', old.rowid, old.message);
+    INSERT INTO logs_fts (rowid, message) VALUES (new.rowid, new.message);
+END;
+-- Bumped by every transaction that changes logs or runs, so readers can
+-- tell whether anything changed without querying them
+CREATE TABLE IF NOT EXISTS log_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    instance TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO log_version (id, instance, version) VALUES (0, lower(hex(randomblob(8))), 0);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SqliteStore:
+    """
+    Storage backend that keeps every collection in one SQLite database.
+
+    The database runs in WAL mode so page requests can read while a bot
+    thread or another worker is writing. Each thread gets its own connection.
+    """
+
+    def __init__(self, db_path, retention_days=30, retention_bytes=2 * 1024 ** 3, import_from=None):
+        """
+        Args:
+            db_path (str): Path of the SQLite database file
+            retention_days (int): Days log entries are kept; 0 keeps them
+                regardless of age
+            retention_bytes (int): Database size above which the oldest days
+                of logs are deleted; 0 for no limit
+            import_from (JsonStore, optional): Store whose data is copied into
+                the database when the database file is created
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self._local = threading.local()
+        self._retention_checked_at = None
+
+        is_new = not os.path.exists(db_path)
+        conn = self._connect()
+        has_search = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'logs_fts'").fetchone() is not None
+        with conn:
+            conn.executescript(SCHEMA)
+            if not has_search:
+                # Databases created before search existed get their logs indexed once
+                conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
+        if is_new and import_from is not None:
+            self._import(import_from)
+        # Databases created before run summaries existed get them built once
+        if conn.execute('SELECT 1 FROM runs LIMIT 1').fetchone() is None:
+            self.rebuild_runs()
+        self._enforce_retention()
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _import(self, json_store):
+        """Copy every collection, the settings and the logs from a JSON store"""
+        for collection in COLLECTION_COLUMNS:
+            for record in json_store.list(collection):
+                self.insert(collection, record)
+        settings_data = json_store.get_settings(None)
+        if settings_data is not None:
+            self.save_settings(settings_data)
+        # Oldest first, so rowid order (the order search results come in) follows log order
+        entries = json_store.query_logs()[::-1]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO logs (id, message, level, timestamp, group_id) VALUES (?, ?, ?, ?, ?)',
+                [tuple(entry.get(column) for column in LOG_COLUMNS) for entry in entries]
+            )
+            self._bump_log_version(conn)
+
+    @staticmethod
+    def _to_record(row):
+        """Convert a row into the dict shape the JSON backend returns"""
+        record = dict(row)
+        for column in BOOLEAN_COLUMNS & record.keys():
+            if record[column] is not None:
+                record[column] = bool(record[column])
+        return record
+
+    @staticmethod
+    def _to_log(row):
+        """Convert a logs row into a log entry; group_id is omitted when unset"""
+        entry = dict(row)
+        if entry.get('group_id') is None:
+            entry.pop('group_id', None)
+        return entry
+
+    # ------------------------------
+    # Collections
+    # ------------------------------
+    def list(self, collection):
+        """Return every record of a collection in insertion order"""
+        columns = ', '.join(COLLECTION_COLUMNS[collection])
+        rows = self._connect().execute(f'SELECT {columns} FROM {collection} ORDER BY rowid')
+        return [self._to_record(row) for row in rows]
+
+    def get(self, collection, record_id):
+        """Return the record with the given id, or None"""
+        columns = ', '.join(COLLECTION_COLUMNS[collection])
+        row = self._connect().execute(
+            f'SELECT {columns} FROM {collection} WHERE id = ?', (record_id,)
+        ).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def insert(self, collection, record):
+        """Insert a record into a collection"""
+        columns = COLLECTION_COLUMNS[collection]
+        placeholders = ', '.join('?' for _ in columns)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f'INSERT INTO {collection} ({", ".join(columns)}) VALUES ({placeholders})',
+                tuple(record.get(column) for column in columns)
+            )
+
+    def update(self, collection, record_id, fields):
+        """Update fields of a record; returns False if it does not exist"""
+        columns = [column for column in fields if column in COLLECTION_COLUMNS[collection]]
+        if not columns:
+            return self.get(collection, record_id) is not None
+        assignments = ', '.join(f'{column} = ?' for column in columns)
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f'UPDATE {collection} SET {assignments} WHERE id = ?',
+                tuple(fields[column] for column in columns) + (record_id,)
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, collection, record_id):
+        """Delete a record; returns the deleted record or None"""
+        conn = self._connect()
+        with conn:
+            record = self.get(collection, record_id)
+            if record is not None:
+                conn.execute(f'DELETE FROM {collection} WHERE id = ?', (record_id,))
+        return record
+
+    # ------------------------------
+    # Settings
+    # ------------------------------
+    def get_settings(self, default):
+        rows = self._connect().execute('SELECT key, value FROM settings ORDER BY rowid').fetchall()
+        if not rows:
+            return default
+        return {row['key']: json.loads(row['value']) for row in rows}
+
+    def save_settings(self, settings_data):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM settings')
+            conn.executemany(
+                'INSERT INTO settings (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in settings_data.items()]
+            )
+
+    # ------------------------------
+    # Logs
+    # ------------------------------
+    def append_log(self, log_entry):
+        """Add a log entry"""
+        self.append_logs([log_entry])
+
+    def append_logs(self, log_entries):
+        """Add several log entries in one transaction; entries without a timestamp get the current time"""
+        now = datetime.now().isoformat()
+        for entry in log_entries:
+            entry.setdefault('timestamp', now)
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO logs (id, message, level, timestamp, group_id) VALUES (?, ?, ?, ?, ?)',
+                [tuple(entry.get(column) for column in LOG_COLUMNS) for entry in log_entries]
+            )
+            self._update_runs(conn, log_entries)
+            self._bump_log_version(conn)
+        if time.monotonic() - self._retention_checked_at >= RETENTION_CHECK_INTERVAL:
+            self._enforce_retention()
+
+    @staticmethod
+    def _bump_log_version(conn):
+        """Mark logs or runs as changed. Caller holds the transaction."""
+        conn.execute('UPDATE log_version SET version = version + 1')
+
+    def log_version(self):
+        """Return a string that changes whenever logs or run summaries change"""
+        instance, version = self._connect().execute('SELECT instance, version FROM log_version').fetchone()
+        return f"{instance}.{version}"
+
+    def _used_bytes(self, conn):
+        """Bytes of the database in use (free pages are reused before the file grows)"""
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def _enforce_retention(self):
+        """
+        Delete log entries older than retention_days, then whole days of the
+        oldest entries while the database is larger than retention_bytes
+        (the newest day is always kept). Runs whose logs are all gone are
+        deleted with them.
+        """
+        self._retention_checked_at = time.monotonic()
+        conn = self._connect()
+        deleted = 0
+        with conn:
+            if self.retention_days:
+                cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+                deleted += conn.execute('DELETE FROM logs WHERE timestamp < ?', (cutoff,)).rowcount
+            while self.retention_bytes and self._used_bytes(conn) > self.retention_bytes:
+                oldest, newest = conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM logs').fetchone()
+                if oldest is None or oldest[:10] == newest[:10]:
+                    break
+                next_day = (date.fromisoformat(oldest[:10]) + timedelta(days=1)).isoformat()
+                deleted += conn.execute('DELETE FROM logs WHERE timestamp < ?', (next_day,)).rowcount
+            if deleted:
+                conn.execute(
+                    'DELETE FROM runs WHERE last_timestamp < (SELECT MIN(timestamp) FROM logs) '
+                    'OR NOT EXISTS (SELECT 1 FROM logs)'
+                )
+                self._bump_log_version(conn)
+        if deleted:
+            logger.info("Log retention removed %d log entries from %s", deleted, self.db_path)
+
+    @staticmethod
+    def _log_filter(group_id=None, before=None, after=None):
+        """Return a WHERE clause and its parameters for a log query"""
+        conditions, params = [], ()
+        if group_id:
+            conditions.append('group_id = ?')
+            params += (group_id,)
+        if before is not None:
+            conditions.append('(timestamp, id) < (?, ?)')
+            params += tuple(before)
+        if after is not None:
+            conditions.append('(timestamp, id) > (?, ?)')
+            params += tuple(after)
+        return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def count_logs(self, group_id=None):
+        """Return the number of log entries, optionally only those of one group"""
+        where, params = self._log_filter(group_id)
+        return self._connect().execute(f'SELECT COUNT(*) FROM logs {where}', params).fetchone()[0]
+
+    def query_logs(self, group_id=None, offset=0, limit=None, before=None, after=None):
+        """
+        Return log entries newest first.
+
+        Args:
+            group_id (str, optional): Only include logs of this group
+            offset (int): Number of matching entries to skip
+            limit (int, optional): Maximum number of entries to return
+            before (tuple, optional): (timestamp, id) cursor; only return
+                entries older than it
+            after (tuple, optional): (timestamp, id) cursor; only return the
+                entries just newer than it (the oldest ones when limited)
+        """
+        where, params = self._log_filter(group_id, before, after)
+        # Walk the index away from the cursor, so a page costs the same at any depth
+        order = 'ASC' if after is not None else 'DESC'
+        rows = self._connect().execute(
+            f'SELECT id, message, level, timestamp, group_id FROM logs {where} '
+            f'ORDER BY timestamp {order}, id {order} LIMIT ? OFFSET ?',
+            params + (-1 if limit is None else limit, offset)
+        )
+        entries = [self._to_log(row) for row in rows]
+        if after is not None:
+            entries.reverse()
+        return entries
+
+    def search_logs(self, query=None, level=None, group_id=None, start=None, end=None, limit=50, offset=0):
+        """Return log entries whose message contains a phrase, newest first; see JsonlLogStore.search"""
+        match = phrase_query(query) if query else None
+        if query and not match:
+            return []
+        conditions, params = search_filter('logs.', level, group_id, start, end)
+        if match:
+            sql = (f'SELECT {", ".join("logs." + column for column in LOG_COLUMNS)} FROM logs_fts '
+                   'JOIN logs ON logs.rowid = logs_fts.rowid WHERE logs_fts MATCH ?')
+            params.insert(0, match)
+            order = 'ORDER BY logs_fts.rowid DESC'
+        else:
+            sql = f'SELECT {", ".join(LOG_COLUMNS)} FROM logs WHERE 1'
+            order = 'ORDER BY logs.timestamp DESC, logs.id DESC'
+        for condition in conditions:
+            sql += f' AND {condition}'
+        sql += f' {order} LIMIT ? OFFSET ?'
+        rows = self._connect().execute(sql, params + [-1 if limit is None else limit, offset])
+        return [self._to_log(row) for row in rows]
+
+    def tail_logs(self, limit):
+        """Return the newest log entries (a walk down the timestamp index)"""
+        return self.query_logs(limit=limit)
+
+    # ------------------------------
+    # Run summaries
+    # ------------------------------
+    def _fetch_runs(self, conn, group_ids):
+        placeholders = ', '.join('?' for _ in group_ids)
+        rows = conn.execute(
+            f'SELECT {", ".join(RUN_COLUMNS)} FROM runs WHERE group_id IN ({placeholders})',
+            tuple(group_ids)
+        )
+        return {row['group_id']: dict(row) for row in rows}
+
+    def _save_runs(self, conn, summaries):
+        placeholders = ', '.join('?' for _ in RUN_COLUMNS)
+        conn.executemany(
+            f'INSERT OR REPLACE INTO runs ({", ".join(RUN_COLUMNS)}) VALUES ({placeholders})',
+            [tuple(summary[column] for column in RUN_COLUMNS) for summary in summaries]
+        )
+
+    def _update_runs(self, conn, log_entries):
+        """Apply new log entries to their run summaries. Caller holds the transaction."""
+        group_ids = {entry['group_id'] for entry in log_entries if entry.get('group_id')}
+        if not group_ids:
+            return
+        changed = apply_entries(self._fetch_runs(conn, group_ids), log_entries)
+        self._save_runs(conn, changed.values())
+
+    def get_runs(self, limit=10):
+        """Return the summaries of the latest runs, newest first"""
+        rows = self._connect().execute(
+            f'SELECT {", ".join(RUN_COLUMNS)} FROM runs ORDER BY started_at DESC LIMIT ?',
+            (-1 if limit is None else limit,)
+        )
+        return [dict(row) for row in rows]
+
+    def get_run(self, group_id):
+        return self._fetch_runs(self._connect(), [group_id]).get(group_id)
+
+    def rebuild_runs(self):
+        """
+        Recreate every run summary from the log entries.
+
+        Returns:
+            int: Number of runs found
+        """
+        conn = self._connect()
+        with conn:
+            rows = conn.execute(
+                'SELECT id, message, level, timestamp, group_id FROM logs '
+                'WHERE group_id IS NOT NULL ORDER BY timestamp'
+            )
+            summaries = apply_entries({}, [dict(row) for row in rows])
+            conn.execute('DELETE FROM runs')
+            self._save_runs(conn, summaries.values())
+            self._bump_log_version(conn)
+        return len(summaries)
@@ -6,7 +6,6 @@ import os
 import uuid
 from flask import current_app
 
-from app.automations.main import run_airtasker_bot
 from app import data_manager as dm
 
 def start_bot_task(account_id, city_id, message_id, max_posts=3, image=None, headless=True):
@@ -43,6 +42,10 @@ def start_bot_task(account_id, city_id, message_id, max_posts=3, image=None, hea
     def run_bot_with_logging():
         with create_app().app_context():
             try:
+                # Selenium and the Chrome helpers are only imported once a run
+                # starts, so web workers that never run the bot don't load them
+                from app.automations.main import run_airtasker_bot
+
                 dm.add_log(f"Using message content: {message['content']}", "info", group_id=group_id)
                 # Update the last used timestamp
                 dm.update_account_last_used(account_id)
@@ -58,9 +61,12 @@ def start_bot_task(account_id, city_id, message_id, max_posts=3, image=None, hea
                     headless=headless
                 )
                 
+                # The run's screenshots are logged as they are written; log them before the final entry
+                dm.flush_screenshots()
                 dm.add_log("Bot task completed successfully", "success", group_id=group_id)
             except Exception as e:
                 tb = traceback.format_exc()
+                dm.flush_screenshots()
                 dm.add_log(f"Bot error: {str(e)}\n{tb}", "error", group_id=group_id)
     
     # Start the bot in a separate thread
@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Widths thumbnails are made in; the gallery asks for these only, so the
+# cache holds at most this many files per screenshot
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_QUALITY = 80
+
+
+class ThumbnailCache:
+    """
+    JPEG thumbnails of the screenshots, made on first request and cached in
+    a directory.
+
+    A thumbnail is keyed by its source file name and width
+    (<filename>.<width>.jpg) and is made again when the source is newer than
+    it. Pillow is imported on first use, so processes that never serve a
+    thumbnail don't load it.
+    """
+
+    def __init__(self, source_dir, cache_dir):
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir
+
+    def thumbnail_name(self, filename, width):
+        return f"{filename}.{width}.jpg"
+
+    def get(self, filename, width):
+        """
+        Return the name of the thumbnail in cache_dir, making it if needed.
+
+        Returns:
+            str: File name in cache_dir, or None if the source does not exist
+
+        Raises:
+            ValueError: If width is not one of THUMBNAIL_WIDTHS or filename
+                is not a plain file name
+        """
+        if width not in THUMBNAIL_WIDTHS:
+            raise ValueError(f"Thumbnail width must be one of {THUMBNAIL_WIDTHS}")
+        if os.path.basename(filename) != filename or filename.startswith('.'):
+            raise ValueError(f"Invalid screenshot name: {filename!r}")
+        source = os.path.join(self.source_dir, filename)
+        name = self.thumbnail_name(filename, width)
+        path = os.path.join(self.cache_dir, name)
+        try:
+            source_mtime = os.stat(source).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        try:
+            if os.stat(path).st_mtime_ns >= source_mtime:
+                return name
+        except FileNotFoundError:
+            pass
+        self._make(source, path, width)
+        return name
+
+    def _make(self, source, path, width):
+        """Write a thumbnail of source to path, atomically"""
+        from PIL import Image
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with Image.open(source) as image:
+            # Scaling down in steps of whole factors first is much faster
+            # than one high-quality resize of a full HD screenshot
+            image.thumbnail((width, width * 4), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            image = image.convert('RGB')
+            # Other requests for the same thumbnail may be making it too; the
+            # last rename wins and readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            image.save(tmp_path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+        logger.debug("Made thumbnail %s", path)
+
+    def remove(self, filename):
+        """
+        Delete the cached thumbnails of a screenshot.
+
+        Returns:
+            int: Bytes freed
+        """
+        freed = 0
+        for width in THUMBNAIL_WIDTHS:
+            path = os.path.join(self.cache_dir, self.thumbnail_name(filename, width))
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+# What a gunicorn worker imports ("run:app"), and the same worker once the
+# Selenium automation stack is loaded, which every worker paid before it was
+# imported lazily
+SCENARIOS = {
+    'web worker': 'import run',
+    'web worker + automations': 'import run; import app.automations.main',
+}
+
+HEAVY_MODULES = ['selenium.webdriver', 'chromedriver_autoinstaller', 'chrome_extension_python', 'app.automations.main']
+
+# Runs in the child after the imports; prints peak RSS and the heavy modules it loaded
+REPORT = (
+    "import sys, json, resource; "
+    "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+    "rss = rss if sys.platform == 'darwin' else rss * 1024; "
+    "print(json.dumps({'rss': rss, 'loaded': [m for m in %r if m in sys.modules]}))"
+) % (HEAVY_MODULES,)
+
+def parse_importtime(stderr):
+    """Return total import time in ms and {module: cumulative ms} from -X importtime output"""
+    total = 0
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        cumulative[name.strip()] = int(cumulative_us) / 1000
+    return total / 1000, cumulative
+
+def measure(code):
+    # Fresh interpreter per run, so nothing is cached in sys.modules
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"{code}; {REPORT}"],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    total, cumulative = parse_importtime(result.stderr)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return total, cumulative, report
+
+def benchmark(repeat):
+    for name, code in SCENARIOS.items():
+        runs = [measure(code) for _ in range(repeat)]
+        total = statistics.median(run[0] for run in runs)
+        rss = statistics.median(run[2]['rss'] for run in runs)
+        print(f"{name} ({code}), median of {repeat}:")
+        print(f"  {'import time':<28} {total:10.1f} ms")
+        print(f"  {'peak RSS':<28} {rss / 2**20:10.1f} MB")
+        for module in HEAVY_MODULES:
+            times = [run[1][module] for run in runs if module in run[1]]
+            if times:
+                print(f"  {module:<28} {statistics.median(times):10.1f} ms")
+        loaded = runs[-1][2]['loaded']
+        print(f"  heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+
+if __name__ == "__main__":
+    # Usage: python benchmark_imports.py [repeat]
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import sys
+import importlib
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import config
+import app.data_manager
+from app.log_store import JsonlLogStore, LogSegment
+
+def timed(fn, repeat):
+    # Average milliseconds per call
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def load_data_manager(data_dir):
+    # app.data_manager using the JSON store in data_dir
+    os.environ.update(DATA_DIR=data_dir, STORAGE_BACKEND='json', LOG_WRITER_MODE='sync')
+    importlib.reload(config)
+    return importlib.reload(app.data_manager)
+
+def benchmark(lines, latest=5, per_page=50):
+    # Write one day segment with the given number of lines into a scratch directory
+    data_dir = tempfile.mkdtemp()
+    directory = os.path.join(data_dir, 'logs')
+    os.makedirs(directory)
+    try:
+        day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        entries = [{
+            'id': str(uuid.uuid4()),
+            'message': f"Processing task {i} for the current account",
+            'level': 'info',
+            'timestamp': (day + timedelta(microseconds=i * 50)).isoformat(),
+            'group_id': f"run-{i // 500}"
+        } for i in range(lines)]
+        LogSegment(directory, day.date().isoformat()).write_all(entries)
+        path = os.path.join(directory, day.date().isoformat() + '.jsonl')
+        repeat = 3 if lines > 100000 else 20
+        dm = load_data_manager(data_dir)
+
+        def first_page_new_process():
+            # The /logs page: total and page count, then the newest entries
+            dm._store = dm._log_sink = None
+            return dm.get_logs(page=1, per_page=per_page)
+
+        def parse_all():
+            # What get_logs used to do: decode and sort every entry
+            with open(path) as f:
+                logs = [json.loads(line) for line in f]
+            return sorted(logs, key=lambda x: x['timestamp'], reverse=True)[:latest]
+
+        results = {
+            'parse and sort': timed(parse_all, repeat),
+            'index, new process': timed(lambda: JsonlLogStore(directory).query(limit=latest), repeat),
+            'tail, new process': timed(lambda: JsonlLogStore(directory).tail(latest), 200),
+            'get_logs page 1, new process': timed(first_page_new_process, repeat),
+        }
+        store = JsonlLogStore(directory)
+        store.query(limit=latest)
+        results['index, warm'] = timed(lambda: store.query(limit=latest), 200)
+        results['tail, warm'] = timed(lambda: store.tail(latest), 200)
+        dm.get_logs(page=1, per_page=per_page)
+        results['get_logs page 1, warm'] = timed(lambda: dm.get_logs(page=1, per_page=per_page), 200)
+
+        print(f"{lines} lines ({os.path.getsize(path) / 1e6:.0f} MB), latest {latest} entries:")
+        for name, elapsed in results.items():
+            print(f"  {name:<30} {elapsed:10.3f} ms")
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == "__main__":
+    # Usage: python benchmark_logs.py [lines ...]
+    for lines in [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]:
+        benchmark(lines)
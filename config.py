@@ -8,29 +8,79 @@ load_dotenv()
 # Base directory of the application
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Path to data directory
-DATA_DIR = os.path.join(basedir, 'data')
-
-# Create data directory if it doesn't exist
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+# Path to data directory. Nothing is created when this module is imported;
+# init_data_files() sets the directory up on first use.
+DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(basedir, 'data')
 
 # Data file paths
 ACCOUNTS_FILE = os.path.join(DATA_DIR, 'accounts.json')
 CITIES_FILE = os.path.join(DATA_DIR, 'cities.json')
 MESSAGES_FILE = os.path.join(DATA_DIR, 'messages.json')
 SCHEDULES_FILE = os.path.join(DATA_DIR, 'schedules.json')
+# Day segments of the log store
+LOG_DIR = os.path.join(DATA_DIR, 'logs')
+# Single-file logs of earlier versions, migrated into LOG_DIR on first use
+LOG_STORE_FILE = os.path.join(DATA_DIR, 'logs.jsonl')
 LOGS_FILE = os.path.join(DATA_DIR, 'logs.json')
 SETTINGS_FILE = os.path.join(DATA_DIR, 'settings.json')
+# Screenshots taken by the bot, with their manifest (manifest.jsonl)
+SCREENSHOTS_DIR = os.environ.get('SCREENSHOTS_DIR') or os.path.join(basedir, 'screenshots')
+# Screenshots are re-encoded off the bot's thread: 'webp' (lossy, at
+# SCREENSHOT_QUALITY) or 'png' (optimised, lossless)
+SCREENSHOT_FORMAT = os.environ.get('SCREENSHOT_FORMAT', 'webp').lower()
+SCREENSHOT_QUALITY = int(os.environ.get('SCREENSHOT_QUALITY', 80))
+# Gallery thumbnails, made on demand (safe to delete)
+SCREENSHOT_THUMBNAILS_DIR = os.path.join(SCREENSHOTS_DIR, 'thumbnails')
+
+# Storage backend used by app.data_manager: 'json' (one file per collection)
+# or 'sqlite' (a single WAL-mode database in DATA_DIR)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+SQLITE_DB_FILE = os.environ.get('SQLITE_DB_FILE') or os.path.join(DATA_DIR, 'data.sqlite')
+
+# How add_log writes: 'sync' writes in the caller's thread, 'batched' queues
+# entries for a background thread that writes them in batches
+LOG_WRITER_MODE = os.environ.get('LOG_WRITER_MODE', 'sync').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 100))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 0.5))
+
+# Log retention: the oldest days of logs are deleted once they are older than
+# LOG_RETENTION_DAYS or the logs take more than LOG_RETENTION_BYTES (0 turns
+# either limit off). The default leaves most of the 10 GB data disk in
+# render.yaml to the database and screenshots.
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 30))
+LOG_RETENTION_BYTES = int(os.environ.get('LOG_RETENTION_BYTES', 2 * 1024 ** 3))
+
+# Screenshot retention: screenshots older than SCREENSHOT_RETENTION_DAYS are
+# deleted (SCREENSHOT_FAILED_RETENTION_DAYS for failed runs), then the oldest
+# ones while there are more than SCREENSHOT_RETENTION_COUNT or they take more
+# than SCREENSHOT_RETENTION_BYTES, failed runs' last (0 turns a limit off).
+# The web process sweeps every SCREENSHOT_SWEEP_INTERVAL seconds (0: never;
+# sweep_screenshots.py runs it by hand).
+SCREENSHOT_RETENTION_DAYS = int(os.environ.get('SCREENSHOT_RETENTION_DAYS', 14))
+SCREENSHOT_FAILED_RETENTION_DAYS = int(os.environ.get('SCREENSHOT_FAILED_RETENTION_DAYS', 30))
+SCREENSHOT_RETENTION_COUNT = int(os.environ.get('SCREENSHOT_RETENTION_COUNT', 0))
+SCREENSHOT_RETENTION_BYTES = int(os.environ.get('SCREENSHOT_RETENTION_BYTES', 4 * 1024 ** 3))
+SCREENSHOT_SWEEP_INTERVAL = float(os.environ.get('SCREENSHOT_SWEEP_INTERVAL', 3600))
+
+_data_files_ready = False
 
-# Initialize data files if they don't exist
 def init_data_files():
+    """
+    Create DATA_DIR and any data files that don't exist yet. Called by
+    create_app and when the data store is first used; only the first call in
+    a process touches the disk.
+    """
+    global _data_files_ready
+    if _data_files_ready:
+        return
+
+    os.makedirs(DATA_DIR, exist_ok=True)
     files = {
         ACCOUNTS_FILE: [],
         CITIES_FILE: [],
         MESSAGES_FILE: [],
         SCHEDULES_FILE: [],
-        LOGS_FILE: [],
         SETTINGS_FILE: {
             "run_interval": 30,
             "max_posts_per_day": 10,
@@ -41,11 +91,12 @@ def init_data_files():
     
     for file_path, default_data in files.items():
         if not os.path.exists(file_path):
-            with open(file_path, 'w') as f:
+            # Write a temp file and rename it, so other workers never read a partial file
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
                 json.dump(default_data, f, indent=4)
-
-# Initialize data files
-init_data_files()
+            os.replace(tmp_path, file_path)
+    _data_files_ready = True
 
 class Config:
     """Base configuration"""
@@ -53,19 +104,46 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'app/static/uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     CAPSOLVER_API_KEY = os.environ.get('CAPSOLVER_API_KEY') or 'CAP-F79C6D0E7A810348A201783E25287C6003CFB45BBDCB670F96E525E7C0132148'
+    STORAGE_BACKEND = STORAGE_BACKEND
+    SQLITE_DB_FILE = SQLITE_DB_FILE
+    LOG_WRITER_MODE = LOG_WRITER_MODE
+    # Level of the application's own log output (debug, info, warning, error)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # Threads per gunicorn worker (--threads $WEB_THREADS in render.yaml)
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    # Live log streams (/logs/stream) each hold a worker thread while open:
+    # at most LOG_STREAM_MAX_CLIENTS are open at once per process (a quarter
+    # of WEB_THREADS by default), and a stream is closed after
+    # LOG_STREAM_IDLE_TIMEOUT seconds without new entries (browsers check
+    # again LOG_STREAM_IDLE_RETRY seconds later) or after
+    # LOG_STREAM_MAX_DURATION seconds (browsers reconnect at once); either
+    # way they resume from the last entry they received
+    LOG_STREAM_MAX_CLIENTS = int(os.environ.get('LOG_STREAM_MAX_CLIENTS', max(1, WEB_THREADS // 4)))
+    LOG_STREAM_IDLE_TIMEOUT = float(os.environ.get('LOG_STREAM_IDLE_TIMEOUT', 20))
+    LOG_STREAM_IDLE_RETRY = float(os.environ.get('LOG_STREAM_IDLE_RETRY', 20))
+    LOG_STREAM_MAX_DURATION = float(os.environ.get('LOG_STREAM_MAX_DURATION', 120))
+    # Screenshots and thumbnails may be sent by a front proxy instead of a
+    # worker thread: 'x-accel-redirect' (nginx, with an internal location at
+    # SCREENSHOT_ACCEL_PREFIX aliased to SCREENSHOTS_DIR) or 'x-sendfile'
+    # (Apache mod_xsendfile, lighttpd). Empty sends them from the app.
+    SCREENSHOT_SENDFILE = os.environ.get('SCREENSHOT_SENDFILE', '').lower()
+    SCREENSHOT_ACCEL_PREFIX = os.environ.get('SCREENSHOT_ACCEL_PREFIX', '/_screenshots/')
     
     @staticmethod
     def init_app(app):
-        # Create uploads directory if it doesn't exist
+        # Create the data files and uploads directory if they don't exist
+        init_data_files()
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG').upper()
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+import app.data_manager as dm
+
+def rebuild_runs():
+    # Recreate the run summaries shown on the logs page from the stored logs
+    count = dm.rebuild_run_summaries()
+    print(f"Rebuilt summaries for {count} bot runs.")
+
+if __name__ == "__main__":
+    rebuild_runs()
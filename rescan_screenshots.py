@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+import app.data_manager as dm
+
+def rescan_screenshots():
+    # Rebuild the gallery's screenshot manifest from the files on disk
+    result = dm.rescan_screenshots()
+    print(f"Screenshot manifest has {result['total']} screenshots "
+          f"({result['added']} added, {result['removed']} removed, "
+          f"{result['moved']} moved to content-addressed files).")
+
+if __name__ == "__main__":
+    rescan_screenshots()
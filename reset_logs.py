@@ -1,29 +1,32 @@
 #!/usr/bin/env python3
 import os
-import json
+import shutil
+
+from config import LOG_DIR, LOG_STORE_FILE, LOGS_FILE
 
 def reset_logs():
-    # Define the path to the logs file
-    logs_file = os.path.join('data', 'logs.json')
-    
-    # Create empty logs array
-    empty_logs = []
+    # The log segments live in DATA_DIR/logs (importing config creates nothing)
+    logs_dir = LOG_DIR
+    legacy_logs_files = [LOG_STORE_FILE, LOGS_FILE]
     
-    # Ensure the data directory exists
-    os.makedirs('data', exist_ok=True)
+    # Remove every day segment, its index, and the run summaries
+    if os.path.exists(logs_dir):
+        shutil.rmtree(logs_dir)
+    os.makedirs(logs_dir, exist_ok=True)
     
-    # Write the empty logs array to the file
-    with open(logs_file, 'w') as f:
-        json.dump(empty_logs, f, indent=4)
+    # Remove the logs of earlier versions too, so they are not migrated back in
+    for legacy_logs_file in legacy_logs_files:
+        if os.path.exists(legacy_logs_file):
+            os.remove(legacy_logs_file)
     
-    print(f"Logs file '{logs_file}' has been reset to an empty array.")
+    print(f"Logs directory '{logs_dir}' has been reset.")
 
 if __name__ == "__main__":
-    print("This script will reset the logs file to an empty array.")
+    print("This script will remove every entry from the logs.")
     confirm = input("Do you want to continue? (y/n): ")
     
     if confirm.lower() == 'y':
         reset_logs()
         print("Logs have been reset successfully.")
     else:
-        print("Operation cancelled.") 
\ No newline at end of file
+        print("Operation cancelled.")
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import sys
+import app.data_manager as dm
+
+def format_bytes(size):
+    for unit in ('bytes', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'bytes' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def sweep_screenshots(dry_run=False):
+    # Delete screenshots past the SCREENSHOT_RETENTION_* limits in config
+    result = dm.sweep_screenshots(dry_run=dry_run)
+    verb = "Would delete" if dry_run else "Deleted"
+    print(f"{verb} {result['deleted']} screenshots, reclaiming {format_bytes(result['bytes'])}.")
+    print(f"{result['remaining']} screenshots remain ({format_bytes(result['remaining_bytes'])}).")
+
+if __name__ == "__main__":
+    # Usage: python sweep_screenshots.py [--dry-run]
+    sweep_screenshots(dry_run='--dry-run' in sys.argv[1:])
@@ -0,0 +1,52 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import config
+import app.data_manager
+
+
+@pytest.fixture
+def load_data_manager(tmp_path, monkeypatch):
+    """
+    Return a function that reloads config and app.data_manager against a
+    fresh data directory under tmp_path, with the given settings.
+    """
+    loaded = []
+
+    def load(backend='json', log_writer='sync', **env):
+        env = {
+            'DATA_DIR': str(tmp_path / 'data'),
+            'SCREENSHOTS_DIR': str(tmp_path / 'screenshots'),
+            'STORAGE_BACKEND': backend,
+            'LOG_WRITER_MODE': log_writer,
+            'SCREENSHOT_SWEEP_INTERVAL': '0',
+            **env
+        }
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        importlib.reload(config)
+        dm = importlib.reload(app.data_manager)
+        loaded.append(dm)
+        return dm
+
+    yield load
+
+    for dm in loaded:
+        for sink in (dm._log_sink, dm._screenshot_sink):
+            if sink is not None and hasattr(sink, 'close'):
+                sink.close()
+    # Leave the modules configured from the real environment again
+    monkeypatch.undo()
+    importlib.reload(config)
+    importlib.reload(app.data_manager)
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def dm(request, load_data_manager):
+    """app.data_manager on a fresh data directory, once per storage backend"""
+    return load_data_manager(backend=request.param)
@@ -0,0 +1,61 @@
+"""Several processes writing the JSON data files at once, as gunicorn workers and the bot do"""
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app.log_store import JsonlLogStore
+
+WORKERS = 4
+ACCOUNTS_PER_WORKER = 25
+
+
+def _write_accounts(worker, start):
+    from app import data_manager as dm
+
+    start.wait()
+    for i in range(ACCOUNTS_PER_WORKER):
+        account = dm.add_account(f"worker{worker}-{i}@example.com", 'secret')
+        # Read-modify-write of a record others are inserting around
+        dm.update_last_used(account['id'])
+        dm.add_log(f"worker {worker} added account {i}")
+
+
+def test_concurrent_processes_lose_no_updates_and_never_tear_a_file(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / 'data')
+    # Spawned workers inherit the environment and import config with it
+    for name, value in (('DATA_DIR', data_dir), ('STORAGE_BACKEND', 'json'), ('LOG_WRITER_MODE', 'sync')):
+        monkeypatch.setenv(name, value)
+    accounts_file = os.path.join(data_dir, 'accounts.json')
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    workers = [context.Process(target=_write_accounts, args=(worker, start))
+               for worker in range(WORKERS)]
+    for process in workers:
+        process.start()
+    start.set()
+
+    # Readers take no lock, so every read while the workers write must parse
+    reads = 0
+    while any(process.is_alive() for process in workers):
+        try:
+            with open(accounts_file) as f:
+                json.load(f)
+        except FileNotFoundError:
+            continue
+        except json.JSONDecodeError as e:
+            pytest.fail(f"Read a torn accounts.json: {e}")
+        reads += 1
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    with open(accounts_file) as f:
+        accounts = json.load(f)
+    assert len(accounts) == WORKERS * ACCOUNTS_PER_WORKER
+    assert len({account['email'] for account in accounts}) == len(accounts)
+    assert all(account['last_used'] for account in accounts)
+    assert reads > 0
+    assert JsonlLogStore(os.path.join(data_dir, 'logs')).count() == WORKERS * ACCOUNTS_PER_WORKER
+    assert not [name for name in os.listdir(data_dir) if name.endswith('.tmp')]
@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta
+
+from app.log_store import JsonlLogStore
+
+
+def _entries(count, start):
+    return [{'id': str(uuid.uuid4()), 'message': f"entry {i}", 'level': 'info',
+             'timestamp': (start + timedelta(seconds=i)).isoformat()}
+            for i in range(count)]
+
+
+def test_count_reads_open_segments_without_loading_their_index(tmp_path):
+    directory = str(tmp_path / 'logs')
+    start = datetime.now().replace(hour=1, minute=0, second=0, microsecond=0)
+    JsonlLogStore(directory, retention_days=0, retention_bytes=0).append_many(_entries(120, start))
+
+    store = JsonlLogStore(directory, retention_days=0, retention_bytes=0)
+    assert store.count() == 120
+    segment = store._segments[start.date().isoformat()]
+    assert not segment.lines()
+
+    # Entries written by another process are counted from where the last count stopped
+    JsonlLogStore(directory, retention_days=0, retention_bytes=0).append_many(
+        _entries(30, start + timedelta(hours=1)))
+    assert store.count() == 150
+    assert [e['message'] for e in store.query(limit=1)] == ['entry 29']
+    assert store.count() == 150
+
+
+def test_first_page_total_matches_the_entries(load_data_manager):
+    dm = load_data_manager()
+    for i in range(23):
+        dm.add_log(f"entry {i}")
+    dm._store = dm._log_sink = None
+    page = dm.get_logs(page=1, per_page=10)
+    assert (page['total'], page['pages'], len(page['items'])) == (23, 3, 10)
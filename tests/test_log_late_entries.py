@@ -0,0 +1,57 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from app.log_store import JsonlLogStore, LogSegment
+
+
+def _entries(start, count, label):
+    return [{'id': str(uuid.uuid4()), 'message': f"{label} {i}", 'level': 'info',
+             'timestamp': (start + timedelta(minutes=i)).isoformat()}
+            for i in range(count)]
+
+
+def _key(entry):
+    return entry['timestamp'], entry['id']
+
+
+def test_late_entry_for_a_compressed_day_pages_in_order(tmp_path):
+    directory = str(tmp_path / 'logs')
+    today = datetime.now().replace(hour=1, minute=0, second=0, microsecond=0)
+    old = today - timedelta(days=5)
+    store = JsonlLogStore(directory, retention_days=0, retention_bytes=0)
+    entries = _entries(old, 10, 'old') + _entries(today, 10, 'today')
+    store.append_many([dict(entry) for entry in entries])
+    old_day = old.date().isoformat()
+    assert os.path.exists(LogSegment(directory, old_day).gz_path)
+
+    late = _entries(old + timedelta(minutes=4, seconds=30), 1, 'late')[0]
+    store.append(dict(late))
+    entries.append(late)
+
+    # The late entry went into its own day's segment, which is compressed again
+    segment = LogSegment(directory, old_day)
+    assert os.path.exists(segment.gz_path) and not os.path.exists(segment.path)
+    assert store.count() == 21
+
+    newest_first = sorted(entries, key=_key, reverse=True)
+    for reader in (store, JsonlLogStore(directory, retention_days=0, retention_bytes=0)):
+        found, before = [], None
+        while True:
+            items = reader.query(limit=3, before=before)
+            found.extend(items)
+            if len(items) < 3:
+                break
+            before = _key(items[-1])
+        assert [e['id'] for e in found] == [e['id'] for e in newest_first]
+
+        found, after = [], ('', '')
+        while True:
+            items = reader.query(limit=4, after=after)
+            found.extend(reversed(items))
+            if len(items) < 4:
+                break
+            after = _key(items[0])
+        assert [e['id'] for e in found] == [e['id'] for e in reversed(newest_first)]
+
+    assert [e['id'] for e in store.search('late')] == [late['id']]
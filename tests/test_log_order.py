@@ -0,0 +1,120 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.log_store import JsonlLogStore
+
+
+def _shuffled_entries(count, group_id=None, seed=7):
+    """Entries one second apart, in a slightly shuffled write order, as concurrent writers leave them"""
+    start = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    entries = [{'id': str(uuid.uuid4()), 'message': f"B{i}", 'level': 'info',
+                'timestamp': (start + timedelta(seconds=i)).isoformat()}
+               for i in range(count)]
+    if group_id:
+        for entry in entries[::2]:
+            entry['group_id'] = group_id
+    rng = random.Random(seed)
+    written = list(entries)
+    for i in range(0, count - 1, 2):
+        if rng.random() < 0.7:
+            written[i], written[i + 1] = written[i + 1], written[i]
+    written[1], written[-2] = written[-2], written[1]
+    return entries, written
+
+
+def _key(entry):
+    return entry['timestamp'], entry['id']
+
+
+def _walk_before(query, per_page, **filters):
+    found, before = [], None
+    for _ in range(100):
+        items = query(limit=per_page, before=before, **filters)
+        found.extend(items)
+        if len(items) < per_page:
+            return found
+        before = _key(items[-1])
+    pytest.fail("Paging with before cursors did not finish")
+
+
+def _walk_after(query, per_page, **filters):
+    found, after = [], ('', '')
+    for _ in range(100):
+        items = query(limit=per_page, after=after, **filters)
+        found.extend(reversed(items))
+        if len(items) < per_page:
+            return found
+        after = _key(items[0])
+    pytest.fail("Paging with after cursors did not finish")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JsonlLogStore(str(tmp_path / 'logs'), retention_days=0, retention_bytes=0)
+
+
+def test_cursors_follow_timestamp_order_after_out_of_order_appends(store):
+    entries, written = _shuffled_entries(40)
+    # One append per entry, as separate writers would
+    for entry in written:
+        store.append(dict(entry))
+
+    newest_first = sorted(entries, key=_key, reverse=True)
+    assert [e['id'] for e in _walk_before(store.query, 3)] == [e['id'] for e in newest_first]
+    assert [e['id'] for e in _walk_after(store.query, 3)] == [e['id'] for e in reversed(newest_first)]
+    assert [e['id'] for e in store.tail(5)] == [e['id'] for e in newest_first[:5]]
+
+
+def test_group_cursors_follow_timestamp_order(store):
+    entries, written = _shuffled_entries(40, group_id='run-1')
+    store.append_many([dict(entry) for entry in written])
+
+    grouped = sorted((e for e in entries if e.get('group_id')), key=_key, reverse=True)
+    found = _walk_before(store.query, 4, group_id='run-1')
+    assert [e['id'] for e in found] == [e['id'] for e in grouped]
+    found = _walk_after(store.query, 4, group_id='run-1')
+    assert [e['id'] for e in found] == [e['id'] for e in reversed(grouped)]
+
+
+def test_order_survives_reloading_the_index(tmp_path, store):
+    entries, written = _shuffled_entries(20)
+    for entry in written:
+        store.append(dict(entry))
+
+    reopened = JsonlLogStore(str(tmp_path / 'logs'), retention_days=0, retention_bytes=0)
+    newest_first = sorted(entries, key=_key, reverse=True)
+    assert [e['id'] for e in _walk_before(reopened.query, 6)] == [e['id'] for e in newest_first]
+
+
+@pytest.mark.parametrize('log_writer', ['sync', 'batched'])
+def test_data_manager_paging_and_export_after_out_of_order_appends(load_data_manager, log_writer):
+    dm = load_data_manager(log_writer=log_writer)
+    entries, written = _shuffled_entries(40, group_id='run-1')
+    sink = dm._get_log_sink()
+    for entry in written:
+        sink.append_log(dict(entry))
+    dm.flush_logs()
+
+    newest_first = sorted(entries, key=_key, reverse=True)
+    page = dm.get_logs(per_page=7)
+    found = list(page['items'])
+    while page['older']:
+        page = dm.get_logs(per_page=7, before=page['older'])
+        found.extend(page['items'])
+    assert [e['id'] for e in found] == [e['id'] for e in newest_first]
+
+    exported = list(dm.export_logs(batch_size=6))
+    assert [e['id'] for e in exported] == [e['id'] for e in reversed(newest_first)]
+
+    grouped = [e for e in reversed(newest_first) if e.get('group_id')]
+    followed, cursor = [], None
+    while True:
+        items = dm.get_logs_after('run-1', cursor, limit=5)
+        if not items:
+            break
+        followed.extend(items)
+        cursor = items[-1]['cursor']
+    assert [e['id'] for e in followed] == [e['id'] for e in grouped]
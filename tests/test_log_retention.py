@@ -0,0 +1,42 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from app.log_search import LogSearchIndex
+from app.log_store import JsonlLogStore, LogSegment
+
+
+def _entries(day, count):
+    return [{'id': str(uuid.uuid4()), 'message': f"line {i} of {day.date()} with some words to index",
+             'level': 'info', 'timestamp': (day + timedelta(seconds=i)).isoformat()}
+            for i in range(count)]
+
+
+def _disk_bytes(directory, days):
+    return (sum(LogSegment(directory, day).size() for day in days) +
+            LogSearchIndex(os.path.join(directory, 'search.sqlite')).size())
+
+
+def test_retention_counts_and_prunes_the_search_index(tmp_path):
+    directory = str(tmp_path / 'logs')
+    now = datetime.now()
+    old_days = [now - timedelta(days=n) for n in (6, 5, 4)]
+    store = JsonlLogStore(directory, retention_days=0, retention_bytes=0)
+    for day in old_days:
+        store.append_many(_entries(day, 300))
+    store.search('words')
+    days = [day.date().isoformat() for day in old_days]
+    segment_bytes = sum(LogSegment(directory, day).size() for day in days)
+    search_bytes = LogSearchIndex(store.search_path).size()
+    assert search_bytes > 0
+
+    # The segments alone fit, but not with the search index
+    limit = segment_bytes + search_bytes // 2
+    store = JsonlLogStore(directory, retention_days=0, retention_bytes=limit)
+    store.append(_entries(now, 1)[0])
+
+    assert not os.path.exists(LogSegment(directory, days[0]).gz_path)
+    index = LogSearchIndex(store.search_path)
+    assert index.indexed_lines(days[0]) == 0
+    assert index.indexed_lines(days[-1]) == 300
+    assert _disk_bytes(directory, days + [now.date().isoformat()]) <= limit
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import config
+from app import create_app
+
+
+@pytest.fixture
+def app(load_data_manager):
+    dm = load_data_manager()
+    dm.add_log("Bot started", group_id='run-1')
+    app = create_app()
+    app.config.update(TESTING=True, LOG_STREAM_MAX_CLIENTS=1, LOG_STREAM_IDLE_TIMEOUT=0,
+                      LOG_STREAM_IDLE_RETRY=7)
+    return app
+
+
+def test_stream_cap_defaults_to_a_quarter_of_the_threads(load_data_manager):
+    load_data_manager(WEB_THREADS=8)
+    assert config.Config.LOG_STREAM_MAX_CLIENTS == 2
+    load_data_manager(WEB_THREADS=2)
+    assert config.Config.LOG_STREAM_MAX_CLIENTS == 1
+
+
+def test_idle_stream_closes_and_tells_the_browser_when_to_check_again(app):
+    response = app.test_client().get('/logs/stream?group_id=run-1')
+    body = response.get_data(as_text=True)
+    # Closing the response releases the stream's slot
+    response.close()
+    messages = [block for block in body.split('\n\n') if block.strip()]
+
+    assert messages[0] == 'retry: 3000'
+    assert json.loads(messages[1].split('data: ', 1)[1])['message'] == "Bot started"
+    event, data = messages[-1].split('\n')
+    assert event == 'event: idle'
+    assert json.loads(data[len('data: '):])['retry_seconds'] == 7
+
+
+def test_streams_over_the_cap_are_refused_until_one_closes(app):
+    client = app.test_client()
+    first = client.get('/logs/stream?group_id=run-1', buffered=False)
+    assert first.status_code == 200
+    refused = client.get('/logs/stream?group_id=run-1')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After']
+    first.close()
+    second = client.get('/logs/stream?group_id=run-1', buffered=False)
+    assert second.status_code == 200
+    second.close()
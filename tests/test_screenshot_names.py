@@ -0,0 +1,39 @@
+import io
+import os
+
+from PIL import Image
+
+import app.screenshot_sink
+from app.screenshot_manifest import BLOB_NAME, parse_filename
+
+
+def _png(color):
+    output = io.BytesIO()
+    Image.new('RGB', (32, 24), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+def test_screenshots_in_the_same_second_get_their_own_records(load_data_manager, monkeypatch):
+    dm = load_data_manager()
+    monkeypatch.setattr(app.screenshot_sink.time, 'time', lambda: 1760000000.25)
+    names = [dm.save_screenshot(_png(color), 'login_page', group_id='run-1')
+             for color in ('red', 'green', 'blue')]
+    dm.flush_screenshots()
+
+    assert len(set(names)) == 3
+    assert [parse_filename(name)[0] for name in names] == ['login_page'] * 3
+    assert sorted(record['filename'] for record in dm.get_run_screenshots('run-1')) == sorted(names)
+
+    # Every blob belongs to a record, so removing the records frees them all
+    manifest = dm._get_screenshots()
+    manifest.remove(names)
+    assert not [name for name in os.listdir(dm.get_screenshots_dir()) if BLOB_NAME.match(name)]
+
+
+def test_parse_filename_reads_both_name_forms():
+    prefix, taken_at = parse_filename('login_page_1760000000-250.webp')
+    assert prefix == 'login_page'
+    assert taken_at.timestamp() == 1760000000.25
+    prefix, taken_at = parse_filename('login_page_1760000000.png')
+    assert prefix == 'login_page'
+    assert taken_at.timestamp() == 1760000000
@@ -0,0 +1,97 @@
+import io
+import re
+
+import pytest
+from PIL import Image
+
+from app import create_app
+from app.thumbnails import THUMBNAIL_WIDTHS
+
+
+def _png(color):
+    output = io.BytesIO()
+    Image.new('RGB', (800, 600), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def dm(load_data_manager):
+    dm = load_data_manager()
+    for color in ('red', 'green'):
+        dm.save_screenshot(_png(color), 'login_page', group_id='run-1')
+    dm.flush_screenshots()
+    return dm
+
+
+@pytest.fixture
+def app(dm):
+    app = create_app()
+    app.config.update(TESTING=True, SCREENSHOT_SENDFILE='')
+    return app
+
+
+def _image_urls(html):
+    return sorted(set(re.findall(r'(/screenshot/[^"\s]+)', html)))
+
+
+def test_warm_revisit_sends_no_image_bodies(app):
+    client = app.test_client()
+    urls = _image_urls(client.get('/screenshots').get_data(as_text=True))
+    assert any('/thumbnail/' in url for url in urls)
+    assert any('/thumbnail/' not in url for url in urls)
+
+    etags = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 365 * 24 * 3600
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        etags[url] = etag
+
+    for url in urls:
+        response = client.get(url, headers={'If-None-Match': f'"{etags[url]}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+def test_thumbnails_of_every_width_answer_conditional_requests(app, dm):
+    filename = dm.get_run_screenshots('run-1')[0]['filename']
+    client = app.test_client()
+    for width in THUMBNAIL_WIDTHS:
+        url = f'/screenshot/{filename}/thumbnail/{width}'
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first.mimetype == 'image/jpeg'
+        revisit = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert revisit.status_code == 304
+        assert revisit.data == b''
+
+
+def test_range_requests(app, dm):
+    filename = dm.get_run_screenshots('run-1')[0]['filename']
+    response = app.test_client().get(f'/screenshot/{filename}', headers={'Range': 'bytes=0-9'})
+    assert response.status_code == 206
+    assert len(response.data) == 10
+
+
+@pytest.mark.parametrize('mode, header', [('x-accel-redirect', 'X-Accel-Redirect'), ('x-sendfile', 'X-Sendfile')])
+def test_proxy_offload_sends_headers_only(app, dm, mode, header):
+    app.config.update(SCREENSHOT_SENDFILE=mode, SCREENSHOT_ACCEL_PREFIX='/_screenshots/')
+    record = dm.get_run_screenshots('run-1')[0]
+    client = app.test_client()
+    for url in (f"/screenshot/{record['filename']}", f"/screenshot/{record['filename']}/thumbnail/320"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data == b''
+        assert response.cache_control.immutable
+        location = response.headers[header]
+        if mode == 'x-accel-redirect':
+            assert location.startswith('/_screenshots/')
+        assert location.endswith('.jpg' if '/thumbnail/' in url else record['blob'])
+
+        revisit = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert revisit.status_code == 304
+        assert revisit.data == b''
@@ -0,0 +1,59 @@
+import io
+import os
+
+from PIL import Image
+
+from app.screenshot_manifest import ScreenshotManifest
+from app.screenshot_sink import ScreenshotSink
+
+
+def _png(color='red'):
+    output = io.BytesIO()
+    Image.new('RGB', (32, 24), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+def test_blob_deleted_before_the_record_is_written_again_and_recorded(tmp_path):
+    directory = str(tmp_path / 'screenshots')
+    manifest = ScreenshotManifest(directory)
+    calls = []
+
+    def on_saved(filename, blob, size, prefix=None, **context):
+        if not calls:
+            # Retention deletes the blob between the write and the record
+            os.remove(os.path.join(directory, blob))
+        calls.append(filename)
+        return manifest.add(filename, prefix=prefix, blob=blob, **context) is not None
+
+    sink = ScreenshotSink(directory, on_saved=on_saved, image_format='png')
+    filename = sink.save(_png(), 'login_page', group_id='run-1')
+    sink.flush()
+    sink.close()
+
+    assert len(calls) == 2
+    blob = manifest.resolve(filename)
+    assert blob != filename
+    assert os.path.isfile(os.path.join(directory, blob))
+    assert [record['filename'] for record in manifest.for_group('run-1')] == [filename]
+
+
+def test_data_manager_records_and_logs_a_screenshot_once(load_data_manager, monkeypatch):
+    dm = load_data_manager()
+    sink = dm._get_screenshot_sink()
+    deleted = []
+
+    def recorded_after_retention(filename, blob, size, **context):
+        if not deleted:
+            deleted.append(blob)
+            os.remove(os.path.join(dm.get_screenshots_dir(), blob))
+        return dm._screenshot_saved(filename, blob, size, **context)
+
+    monkeypatch.setattr(sink, 'on_saved', recorded_after_retention)
+    filename = dm.save_screenshot(_png('blue'), 'login_page', group_id='run-1')
+    dm.flush_screenshots()
+
+    assert deleted
+    assert [record['filename'] for record in dm.get_run_screenshots('run-1')] == [filename]
+    assert os.path.isfile(os.path.join(dm.get_screenshots_dir(), dm.resolve_screenshot(filename)))
+    saved = dm.search_logs(f"Screenshot saved: {filename}")['items']
+    assert len(saved) == 1
@@ -0,0 +1,120 @@
+"""The behaviour app.data_manager relies on, checked against every STORAGE_BACKEND"""
+
+
+def _key(entry):
+    return entry['timestamp'], entry['id']
+
+
+def test_accounts_crud(dm):
+    first = dm.add_account('a@example.com', 'secret')
+    second = dm.add_account('b@example.com', 'secret', active=False)
+
+    assert [account['email'] for account in dm.get_accounts()] == ['a@example.com', 'b@example.com']
+    assert dm.get_account_by_id(second['id']) == second
+    assert dm.get_account_by_id('missing') is None
+
+    dm.update_last_used(first['id'])
+    assert dm.get_account_by_id(first['id'])['last_used']
+    assert dm.get_account_by_id(second['id'])['last_used'] is None
+
+    assert dm.delete_account(first['id'])
+    assert [account['id'] for account in dm.get_accounts()] == [second['id']]
+
+
+def test_cities_messages_and_schedules_crud(dm):
+    city = dm.add_city('Berlin', '25')
+    assert dm.get_city_by_id(city['id'])['radius'] == 25
+    dm.delete_city(city['id'])
+    assert dm.get_cities() == []
+
+    message = dm.add_message('Hello', image='hello.png')
+    dm.add_message('No image')
+    assert [m['content'] for m in dm.get_messages()] == ['Hello', 'No image']
+    assert dm.get_message_by_id(message['id']) == message
+    # Deleting a message returns its image, for the caller to remove
+    assert dm.delete_message(message['id']) == 'hello.png'
+    assert dm.delete_message('missing') is None
+
+    schedule = dm.add_schedule('09:00', '17:00')
+    assert dm.get_schedules() == [schedule]
+    dm.delete_schedule(schedule['id'])
+    assert dm.get_schedules() == []
+
+
+def test_settings(dm):
+    assert dm.get_settings() == dm.DEFAULT_SETTINGS
+    settings = dict(dm.DEFAULT_SETTINGS, run_interval=7)
+    dm.update_settings(settings)
+    assert dm.get_settings() == settings
+
+
+def test_get_logs_pages_newest_first(dm):
+    added = [dm.add_log(f"entry {i}", 'error' if i % 5 == 0 else 'info',
+                        group_id='run-1' if i % 2 == 0 else None)
+             for i in range(23)]
+    newest_first = sorted(added, key=_key, reverse=True)
+
+    page = dm.get_logs(page=1, per_page=10)
+    assert (page['total'], page['pages'], page['page']) == (23, 3, 1)
+    assert [e['id'] for e in page['items']] == [e['id'] for e in newest_first[:10]]
+    page = dm.get_logs(page=3, per_page=10)
+    assert [e['id'] for e in page['items']] == [e['id'] for e in newest_first[20:]]
+    # Pages past the end show the last page
+    assert dm.get_logs(page=9, per_page=10)['page'] == 3
+
+    grouped = [e for e in newest_first if e.get('group_id') == 'run-1']
+    page = dm.get_logs(page=1, per_page=5, group_id='run-1')
+    assert page['total'] == len(grouped) == 12
+    assert [e['id'] for e in page['items']] == [e['id'] for e in grouped[:5]]
+
+    assert [e['id'] for e in dm.get_latest_logs(3)] == [e['id'] for e in newest_first[:3]]
+    found = dm.search_logs('entry', level='error')
+    assert [e['id'] for e in found['items']] == [e['id'] for e in newest_first if e['level'] == 'error']
+
+
+def test_get_logs_cursors(dm):
+    added = [dm.add_log(f"entry {i}", group_id='run-1') for i in range(12)]
+    newest_first = sorted(added, key=_key, reverse=True)
+
+    page = dm.get_logs(per_page=5)
+    seen = list(page['items'])
+    while page['older']:
+        page = dm.get_logs(per_page=5, before=page['older'])
+        seen.extend(page['items'])
+    assert [e['id'] for e in seen] == [e['id'] for e in newest_first]
+    assert page['newer']
+
+    # Paging back towards the newest entries ends on a full first page
+    page = dm.get_logs(per_page=5, after=page['newer'])
+    assert [e['id'] for e in page['items']] == [e['id'] for e in newest_first[5:10]]
+    page = dm.get_logs(per_page=5, after=page['newer'])
+    assert [e['id'] for e in page['items']] == [e['id'] for e in newest_first[:5]]
+    assert page['newer'] is None
+
+    # An invalid cursor is ignored rather than failing
+    assert len(dm.get_logs(per_page=5, before='not a cursor')['items']) == 5
+
+    cursor = dm.get_log_cursor(newest_first[3])
+    assert [e['id'] for e in dm.get_logs_after('run-1', cursor)] == [e['id'] for e in reversed(newest_first[:3])]
+    assert dm.get_logs_after('run-1', dm.get_log_cursor(newest_first[0])) == []
+    assert [e['id'] for e in dm.export_logs(group_id='run-1', batch_size=4)] == [e['id'] for e in reversed(newest_first)]
+
+
+def test_log_version_changes_with_writes(dm):
+    version = dm.get_log_version()
+    assert dm.get_log_version() == version
+    dm.add_log("first")
+    changed = dm.get_log_version()
+    assert changed != version
+    dm.get_logs()
+    assert dm.get_log_version() == changed
+    dm.add_log("second")
+    assert dm.get_log_version() != changed
+
+
+def test_runs(dm):
+    dm.add_log("Bot started", group_id='run-1')
+    dm.add_log("Bot started", group_id='run-2')
+    assert {run['group_id'] for run in dm.get_runs()} == {'run-1', 'run-2'}
+    assert dm.get_run('run-1')['group_id'] == 'run-1'
+    assert dm.get_run('missing') is None